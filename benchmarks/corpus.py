@@ -0,0 +1,132 @@
+import argparse
+import time
+import numpy as np
+
+# Word list for synthetic comments; drawn with Zipf-like frequencies so a few words dominate
+VOCAB = """
+the a to and of i it is that you in this for was on with but my have not be they just are so
+like if at do what can as get one would all about or there out will more an from people no
+time up don't think how your know when really me good we some it's i'm get because then only
+phone battery camera screen update app software price support game server bug fix feature
+version release patch team design quality shipping order refund warranty service account
+great amazing love awesome best excellent nice happy perfect solid fast easy helpful worth
+bad terrible awful worst hate broken slow annoying useless disappointed problem issue crash
+expensive cheap laggy confusing frustrating waste poor wrong failed missing
+actually probably definitely honestly maybe still even much many most other same new old
+year week day month today yesterday last first next long short big small little high low
+""".split()
+SUBREDDITS = [
+    "technology", "gadgets", "android", "apple", "buildapc", "gaming", "pcgaming", "hardware",
+    "programming", "python", "datascience", "MachineLearning", "linux", "windows", "sysadmin",
+    "personalfinance", "smallbusiness", "startups", "Entrepreneur", "productivity",
+    "AskReddit", "NoStupidQuestions", "explainlikeimfive", "todayilearned", "news",
+]
+
+# Medians and spreads (log-normal) chosen to resemble Reddit: mostly short comments, a long tail
+COMMENT_WORDS_MEDIAN = 18
+COMMENT_WORDS_SIGMA = 1.0
+POST_WORDS_MEDIAN = 60
+POST_WORDS_SIGMA = 1.1
+COMMENTS_PER_POST_MEDIAN = 25
+LINK_POST_SHARE = 0.3
+URL_SHARE = 0.03
+NUMBER_SHARE = 0.05
+
+def _zipf_probabilities(size, exponent=1.1):
+    weights = 1.0 / np.arange(1, size + 1) ** exponent
+    return weights / weights.sum()
+
+def _lognormal_ints(rng, median, sigma, size, low, high):
+    return np.clip(rng.lognormal(np.log(median), sigma, size).astype(int), low, high)
+
+def _texts(rng, lengths, probabilities):
+    word_ids = rng.choice(len(VOCAB), size=int(lengths.sum()), p=probabilities)
+    texts = []
+    start = 0
+    for length in lengths:
+        texts.append(" ".join(VOCAB[i] for i in word_ids[start:start + length]))
+        start += length
+    return texts
+
+def iter_posts(num_comments, seed=0):
+    """Yield posts shaped like `reddit_data.iter_reddit_posts` output, `num_comments` comments in total.
+
+    The same seed always produces the same corpus.
+    """
+    rng = np.random.default_rng(seed)
+    probabilities = _zipf_probabilities(len(VOCAB))
+    now = time.time()
+    remaining = num_comments
+    post_number = 0
+
+    while remaining > 0:
+        count = min(remaining, int(_lognormal_ints(rng, COMMENTS_PER_POST_MEDIAN, 1.0, 1, 1, 500)[0]))
+        remaining -= count
+
+        bodies = _texts(rng, _lognormal_ints(rng, COMMENT_WORDS_MEDIAN, COMMENT_WORDS_SIGMA, count, 1, 1000), probabilities)
+        for i in np.flatnonzero(rng.random(count) < URL_SHARE):
+            bodies[i] += f" https://example.com/{rng.integers(1_000_000)}"
+        for i in np.flatnonzero(rng.random(count) < NUMBER_SHARE):
+            bodies[i] += f" {rng.integers(1, 10_000)}"
+
+        scores = (rng.pareto(1.5, count) * 3).astype(int) - rng.integers(0, 3, count)
+        comments = [{
+            "comment_id": f"c{post_number}_{i}",
+            "comment_body": body,
+            "comment_author": f"user{rng.integers(50_000)}",
+            "comment_score": int(score),
+        } for i, (body, score) in enumerate(zip(bodies, scores))]
+
+        link_post = rng.random() < LINK_POST_SHARE
+        title, content = _texts(rng, np.array([int(rng.integers(4, 16)),
+                                               0 if link_post else int(_lognormal_ints(rng, POST_WORDS_MEDIAN, POST_WORDS_SIGMA, 1, 1, 3000)[0])]),
+                                probabilities)
+        created = now - rng.uniform(0, 30 * 24 * 3600)
+        yield {
+            "post_id": f"p{post_number}",
+            "subreddit": SUBREDDITS[min(int(rng.zipf(1.6)) - 1, len(SUBREDDITS) - 1)],
+            "post_title": title.capitalize(),
+            "post_content": content or "No Content",
+            "post_author": f"user{rng.integers(50_000)}",
+            "post_score": int(rng.pareto(1.2) * 20),
+            "post_url": f"https://www.reddit.com/r/synthetic/comments/p{post_number}/",
+            "post_created_utc": time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(created)),
+            "comments": comments,
+        }
+        post_number += 1
+
+# MiniLM sentence embeddings are 384-dimensional; topics show up as loose clusters
+EMBEDDING_DIM = 384
+EMBEDDING_TOPICS = 256
+EMBEDDING_SPREAD = 0.6
+
+def synthetic_embeddings(num_vectors, dim=EMBEDDING_DIM, topics=EMBEDDING_TOPICS, spread=EMBEDDING_SPREAD, seed=0):
+    """L2-normalised float32 vectors scattered around `topics` random directions.
+
+    `spread` is the typical distance of a vector from its topic centre.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((topics, dim)).astype(np.float32)
+    centres /= np.linalg.norm(centres, axis=1, keepdims=True)
+    vectors = np.empty((num_vectors, dim), dtype=np.float32)
+    for start in range(0, num_vectors, 65536):
+        count = min(65536, num_vectors - start)
+        block = centres[rng.integers(topics, size=count)]
+        block += rng.standard_normal((count, dim)).astype(np.float32) * (spread / np.sqrt(dim))
+        vectors[start:start + count] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    return vectors
+
+def write_corpus(path, num_comments, seed=0):
+    """Write a synthetic corpus as a reddit_data.csv export; returns the number of rows."""
+    # Imported here so generating posts or embeddings doesn't need praw
+    from modules import reddit_data
+    return reddit_data.save_data_to_csv(iter_posts(num_comments, seed), path)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic reddit_data.csv-shaped corpus.")
+    parser.add_argument("--comments", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="data/synthetic_reddit_data.csv")
+    args = parser.parse_args()
+    rows = write_corpus(args.output, args.comments, args.seed)
+    print(f"Wrote {rows} rows to {args.output}")
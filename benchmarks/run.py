@@ -0,0 +1,377 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import tracemalloc
+
+import numpy as np
+import torch
+import streamlit as st
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from benchmarks import corpus
+from modules import (storage, data_access, reddit_data, qa_bot, sentiment_analysis, summarizer, visualizations,
+                     text_normalize, word_frequencies, sharded_inference, optimized_models, retrieval)
+
+logger = logging.getLogger(__name__)
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(REPO_DIR, "benchmarks", "results")
+DEFAULT_SIZES = [1_000, 10_000, 100_000]
+# Benchmarks that run a model see at most this many texts, whatever the corpus size
+MODEL_SAMPLE = 2_000
+# Sentiment over the whole dataset is only run up to this size; larger runs get synthetic labels
+SENTIMENT_LIMIT = 10_000
+QUESTION = "What do people think about the battery?"
+# Index sizes for the retrieval benchmark; the Q/A sample above never reaches qa_bot.ANN_THRESHOLD
+RETRIEVAL_SIZES = [10_000, 100_000, 1_000_000]
+RETRIEVAL_QUERIES = 200
+
+class Benchmark:
+    """A timed call. `run(ctx)` returns the number of items processed; `setup(ctx)` runs untimed before each call.
+
+    `setup` may return a dict of notes (e.g. that inputs were synthetic), recorded with the result.
+    """
+
+    def __init__(self, name, run, setup=None, max_size=None):
+        self.name = name
+        self.run = run
+        self.setup = setup
+        self.max_size = max_size
+
+class Context:
+    def __init__(self, size, posts, workdir, model_sample):
+        self.size = size
+        self.posts = posts
+        self.workdir = workdir
+        self.comments = [comment["comment_body"] for post in posts for comment in post["comments"]]
+        self.sample = self.comments[:model_sample]
+        self.cleaned = text_normalize.clean_texts([c for c in self.comments if len(c) > 20])
+        self.state = {}
+
+# --- benchmark bodies ---
+
+def _save_csv(ctx):
+    return reddit_data.save_data_to_csv(ctx.posts, os.path.join(ctx.workdir, "bench_reddit_data.csv"))
+
+def _cluster(backend):
+    def run(ctx):
+        comments = ctx.cleaned if backend == "tfidf" else ctx.cleaned[:len(ctx.sample)]
+        summarizer.cluster_comments(comments, 5, backend=backend)
+        return len(comments)
+    return run
+
+def _compute_embeddings(ctx):
+    tokenizer, model = qa_bot.load_embedding_model()
+    qa_bot.compute_embeddings(ctx.sample, tokenizer, model)
+    return len(ctx.sample)
+
+def _setup_answers(ctx):
+    if "index" not in ctx.state:
+        tokenizer, model = qa_bot.load_embedding_model()
+        ctx.state["index"] = qa_bot.build_embedding_index(ctx.sample, tokenizer, model)
+
+def _top_k_answers(ctx):
+    tokenizer, model = qa_bot.load_embedding_model()
+    qa_tokenizer, qa_model = qa_bot.load_qa_model()
+    qa_bot.get_top_k_unique_answers(QUESTION, ctx.state["index"], tokenizer, model, qa_tokenizer, qa_model)
+    return 1
+
+def _reset_sentiment(ctx):
+    for path in (sentiment_analysis.SENTIMENT_FILE, sentiment_analysis.SENTIMENT_META_FILE, sentiment_analysis.SENTIMENT_RESULTS_FILE,
+                 sentiment_analysis.ASPECT_RESULTS_FILE, word_frequencies.WORD_FREQUENCIES_FILE, word_frequencies.COUNTED_COMMENTS_FILE,
+                 word_frequencies.WORD_FREQUENCIES_META_FILE):
+        if os.path.exists(path):
+            os.remove(path)
+    ctx.state["synthetic_labels"] = False
+    sentiment_analysis.load_sentiment_cache().clear()
+    data_access.invalidate()
+
+def _sentiment_dataset(ctx):
+    df, _ = sentiment_analysis.compute_sentiment_dataset()
+    return len(df)
+
+def _aspects(ctx):
+    sentiment_analysis.perform_aspect_sentiment_analysis(ctx.sample)
+    return len(ctx.sample)
+
+def _summarize(ctx):
+    summarizer.summarize_content()
+    return len(ctx.comments)
+
+def _ensure_sentiment_file(ctx):
+    # Above SENTIMENT_LIMIT the plots read synthetic labels instead of model output
+    if data_access.load_dataset("sentiment") is None:
+        df = data_access.load_dataset("joined")
+        rng = np.random.default_rng(0)
+        df = df.assign(sentiment=rng.choice(["POSITIVE", "NEGATIVE"], size=len(df)), score=rng.uniform(0.5, 1.0, len(df)))
+        df.to_csv(sentiment_analysis.SENTIMENT_FILE, index=False)
+        with open(sentiment_analysis.SENTIMENT_META_FILE, "w", encoding="utf-8") as file:
+            json.dump({"dataset_version": storage.dataset_version(), "model": sentiment_analysis.SENTIMENT_MODEL_KEY}, file)
+        data_access.invalidate()
+        ctx.state["synthetic_labels"] = True
+    st.cache_data.clear()
+    return {"synthetic_labels": ctx.state.get("synthetic_labels", False)}
+
+def _plot(fn, *args):
+    def run(ctx):
+        fn(*args)
+        plt.close("all")
+        return ctx.size
+    return run
+
+BENCHMARKS = [
+    Benchmark("reddit_data.save_data_to_csv", _save_csv),
+    Benchmark("summarizer.cluster_comments[tfidf]", _cluster("tfidf")),
+    Benchmark("summarizer.cluster_comments[embedding]", _cluster("embedding")),
+    Benchmark("qa_bot.compute_embeddings", _compute_embeddings),
+    Benchmark("qa_bot.get_top_k_unique_answers", _top_k_answers, setup=_setup_answers),
+    Benchmark("sentiment_analysis.compute_sentiment_dataset", _sentiment_dataset, setup=_reset_sentiment, max_size=SENTIMENT_LIMIT),
+    Benchmark("sentiment_analysis.perform_aspect_sentiment_analysis", _aspects),
+    Benchmark("summarizer.summarize_content", _summarize),
+    Benchmark("visualizations.plot_sentiment_distribution", _plot(visualizations.plot_sentiment_distribution), setup=_ensure_sentiment_file),
+    Benchmark("visualizations.generate_word_cloud", _plot(visualizations.generate_word_cloud, "POSITIVE"), setup=_ensure_sentiment_file),
+    Benchmark("visualizations.plot_engagement_metrics", _plot(visualizations.plot_engagement_metrics), setup=_ensure_sentiment_file),
+    Benchmark("visualizations.plot_hourly_post_activity", _plot(visualizations.plot_hourly_post_activity), setup=_ensure_sentiment_file),
+    Benchmark("visualizations.plot_sentiment_trend", _plot(visualizations.plot_sentiment_trend), setup=_ensure_sentiment_file),
+]
+
+# --- harness ---
+
+def _max_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+
+def _proc_status_mb(field):
+    with open("/proc/self/status", "r", encoding="ascii") as file:
+        for line in file:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 2**10
+    raise OSError(f"{field} not in /proc/self/status")
+
+def _start_rss_window():
+    """Reset the peak-RSS counter where the kernel allows it (Linux); returns (baseline_mb, was_reset).
+
+    Without a reset the lifetime high-water mark is all there is, and a benchmark
+    lighter than an earlier one shows no growth at all.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w", encoding="ascii") as file:
+            file.write("5")
+        return _proc_status_mb("VmRSS"), True
+    except OSError:
+        return _max_rss_mb(), False
+
+def _rss_window(baseline, was_reset):
+    peak = _proc_status_mb("VmHWM") if was_reset else _max_rss_mb()
+    result = {"peak_rss_mb": peak, "rss_growth_mb": max(0.0, peak - baseline)}
+    if not was_reset:
+        result["rss_note"] = "lifetime high-water mark; growth only shows past earlier peaks"
+    return result
+
+def run_benchmark(benchmark, ctx, repeat=1, memory=True):
+    """Time `benchmark` `repeat` times, then once more under tracemalloc if `memory` is set.
+
+    The peak is left out, with a note, if tracing was already on or the benchmark stopped it.
+    """
+    result = {"name": benchmark.name, "size": ctx.size}
+    if benchmark.max_size is not None and ctx.size > benchmark.max_size:
+        return {**result, "skipped": f"size above {benchmark.max_size}"}
+
+    try:
+        seconds = []
+        notes = {}
+        rss_window = _start_rss_window()
+        for _ in range(repeat):
+            if benchmark.setup is not None:
+                notes = benchmark.setup(ctx) or {}
+            start = time.perf_counter()
+            items = benchmark.run(ctx)
+            seconds.append(time.perf_counter() - start)
+        rss = _rss_window(*rss_window)
+
+        if memory:
+            if benchmark.setup is not None:
+                benchmark.setup(ctx)
+            if tracemalloc.is_tracing():
+                result["peak_python_mb"] = None
+                result["memory_note"] = "tracemalloc was already running"
+            else:
+                tracemalloc.start()
+                try:
+                    benchmark.run(ctx)
+                    if tracemalloc.is_tracing():
+                        result["peak_python_mb"] = tracemalloc.get_traced_memory()[1] / 2**20
+                    else:
+                        result["peak_python_mb"] = None
+                        result["memory_note"] = "benchmark stopped tracemalloc itself"
+                finally:
+                    if tracemalloc.is_tracing():
+                        tracemalloc.stop()
+    except Exception as e:
+        logger.exception("Benchmark %s failed at size %d", benchmark.name, ctx.size)
+        return {**result, "error": str(e)}
+
+    median = float(np.median(seconds))
+    result.update(notes)
+    result.update({
+        "items": items,
+        "seconds": seconds,
+        "median_seconds": median,
+        "items_per_sec": items / median if median > 0 else None,
+        **rss,
+    })
+    logger.info("%s [%d]: %.3fs", benchmark.name, ctx.size, median)
+    return result
+
+def _prepare_workdir():
+    """A scratch directory laid out like the repo, so every module's relative data/ paths land in it."""
+    workdir = tempfile.mkdtemp(prefix="reddit-bench-")
+    os.symlink(os.path.join(REPO_DIR, "models"), os.path.join(workdir, "models"))
+    os.makedirs(os.path.join(workdir, "data"))
+    return workdir
+
+def _load_corpus(size, seed):
+    posts = list(corpus.iter_posts(size, seed))
+    storage.clear_store()
+    for start in range(0, len(posts), 1000):
+        storage.write_posts(posts[start:start + 1000])
+    data_access.invalidate()
+    return posts
+
+def _environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "torch": torch.__version__,
+        "torch_threads": torch.get_num_threads(),
+        "inference_mode": optimized_models.INFERENCE_MODE,
+    }
+
+def run_suite(sizes=DEFAULT_SIZES, names=None, repeat=1, memory=True, seed=0, model_sample=MODEL_SAMPLE, scaling=False):
+    """Run the selected benchmarks at every corpus size in a scratch directory; returns the report."""
+    benchmarks = [b for b in BENCHMARKS if names is None or b.name in names]
+    report = {"environment": _environment(), "results": []}
+    cwd = os.getcwd()
+    workdir = _prepare_workdir()
+    os.chdir(workdir)
+    try:
+        for size in sizes:
+            for path in os.listdir("data"):
+                full = os.path.join("data", path)
+                shutil.rmtree(full) if os.path.isdir(full) else os.remove(full)
+            ctx = Context(size, _load_corpus(size, seed), workdir, model_sample)
+            for benchmark in benchmarks:
+                report["results"].append(run_benchmark(benchmark, ctx, repeat, memory))
+
+        if scaling:
+            texts = list(corpus.iter_posts(model_sample, seed))
+            texts = [comment["comment_body"] for post in texts for comment in post["comments"]]
+            counts = [n for n in (1, 2, 4, 8, 16, 32) if n <= (os.cpu_count() or 1)]
+            report["scaling"] = {task: sharded_inference.scaling_curve(task, texts, counts) for task in sharded_inference.TASKS}
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+def retrieval_curve(sizes=RETRIEVAL_SIZES, backends=tuple(retrieval.RETRIEVERS), num_queries=RETRIEVAL_QUERIES, k=10, seed=0):
+    """Build time, recall@k against exact search and query latency for each backend and index size.
+
+    Runs on synthetic normalised embeddings, so no model is needed. The queries are
+    drawn from the same topics as the index but are not in it.
+    """
+    curve = []
+    for size in sizes:
+        vectors = corpus.synthetic_embeddings(size + num_queries, seed=seed)
+        embeddings, queries = vectors[:size], vectors[size:]
+        for backend in backends:
+            start = time.perf_counter()
+            try:
+                retriever = retrieval.get_retriever(backend).build(embeddings)
+            except ImportError as e:
+                curve.append({"retriever": backend, "size": size, "skipped": str(e)})
+                continue
+            build_seconds = time.perf_counter() - start
+            result = {"size": size, "build_seconds": build_seconds,
+                      **retrieval.evaluate_retriever(retriever, embeddings, queries, k)}
+            logger.info("%s [%d]: recall %.3f, p95 %.2f ms", backend, size, result["recall"], result["p95_ms"])
+            curve.append(result)
+    return curve
+
+def compare(report, baseline, threshold=1.25):
+    """Benchmarks whose median time grew by more than `threshold`x relative to `baseline`."""
+    previous = {(r["name"], r["size"]): r for r in baseline["results"] if "median_seconds" in r}
+    regressions = []
+    for result in report["results"]:
+        before = previous.get((result["name"], result["size"]))
+        if before is None or "median_seconds" not in result or before["median_seconds"] <= 0:
+            continue
+        ratio = result["median_seconds"] / before["median_seconds"]
+        if ratio > threshold:
+            regressions.append({"name": result["name"], "size": result["size"], "ratio": ratio,
+                                "before": before["median_seconds"], "after": result["median_seconds"]})
+    return regressions
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    parser = argparse.ArgumentParser(description="Benchmark the analysis hot paths on synthetic Reddit corpora.")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES), help="Comma-separated corpus sizes in comments (1000 to 1000000).")
+    parser.add_argument("--only", help="Comma-separated benchmark names to run (default: all).")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the extra tracemalloc run per benchmark.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--model-sample", type=int, default=MODEL_SAMPLE)
+    parser.add_argument("--scaling", action="store_true", help="Also measure sharded inference at 1, 2, 4, 8... workers.")
+    parser.add_argument("--retrieval", action="store_true",
+                        help="Also measure retrieval backends on synthetic embeddings (10k to 1M vectors).")
+    parser.add_argument("--retrieval-sizes", default=",".join(str(s) for s in RETRIEVAL_SIZES))
+    parser.add_argument("--output", help="JSON file to write (default: benchmarks/results/<timestamp>.json).")
+    parser.add_argument("--compare", help="Earlier results JSON to check for regressions.")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Slowdown ratio that counts as a regression.")
+    args = parser.parse_args(argv)
+
+    report = run_suite(
+        sizes=[int(size) for size in args.sizes.split(",")],
+        names=args.only.split(",") if args.only else None,
+        repeat=args.repeat,
+        memory=not args.no_memory,
+        seed=args.seed,
+        model_sample=args.model_sample,
+        scaling=args.scaling,
+    )
+    if args.retrieval:
+        report["retrieval"] = retrieval_curve([int(size) for size in args.retrieval_sizes.split(",")])
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            report["regressions"] = compare(report, json.load(file), args.threshold)
+        exit_code = 1 if report["regressions"] else 0
+
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"Results written to {output}")
+    for regression in report.get("regressions", []):
+        print(f"REGRESSION {regression['name']} [{regression['size']}]: {regression['ratio']:.2f}x slower")
+    return exit_code
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,20 @@
-import streamlit as st
-from modules import reddit_data, summarizer, sentiment_analysis, visualizations, qa_bot
 import os
+import logging
+import streamlit as st
+from modules import reddit_data, summarizer, sentiment_analysis, visualizations, qa_bot, model_registry, storage, data_access, word_frequencies, pipeline
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+# Modules register their models lazily; load them off the UI thread so pages render immediately
+WARM_UP_MODELS = True
+if WARM_UP_MODELS:
+    model_registry.warm_up(background=True)
 
 st.sidebar.title("📌 Reddit Analyzer")
 page = st.sidebar.radio("📂 Navigate", ["Home", "Summarization", "Sentiment Analysis", "Q/A Chatbot", "Visualizations"])
+load_times = model_registry.load_times()
+if load_times:
+    st.sidebar.caption("Model load times: " + ", ".join(f"{name} {seconds:.1f}s" for name, seconds in sorted(load_times.items())))
 
 if page == "Home":
     st.title("🔍 Reddit Topic Analyzer - Data Collection")
@@ -13,9 +24,13 @@ if page == "Home":
     max_runtime = st.slider("⏳ Max Runtime (seconds)", 10, 300, 60)
 
     if st.button("🗑️ Clear Previous Data"):
-        for file in ["data/reddit_data.csv", "data/reddit_sentiment_analysis.csv", "data/summarized_reddit_data.txt"]:
+        for file in ["data/reddit_data.csv", "data/reddit_sentiment_analysis.csv", "data/summarized_reddit_data.txt", data_access.SENTIMENT_META_FILE, reddit_data.CHECKPOINT_FILE,
+                     word_frequencies.WORD_FREQUENCIES_FILE, word_frequencies.COUNTED_COMMENTS_FILE, word_frequencies.WORD_FREQUENCIES_META_FILE,
+                     pipeline.PIPELINE_STATE_FILE]:
             if os.path.exists(file):
                 os.remove(file)
+        storage.clear_store()
+        data_access.invalidate()
         st.cache_data.clear()
         st.success("✅ Previous data cleared. Ready to fetch new data.")
 
@@ -25,17 +40,19 @@ if page == "Home":
         else:
             try:
                 with st.spinner("🔄 Fetching data from Reddit..."):
-                    data = reddit_data.fetch_reddit_data(
+                    reddit_data.fetch_to_store(
                         keyword=keyword,
                         post_limit=post_limit,
                         max_comments=max_comments,
                         max_runtime=max_runtime
                     )
-                    reddit_data.save_data_to_csv(data)
+                    # New files on disk: drop every page's cached copy of the old dataset
+                    data_access.invalidate()
                 st.success("✅ New data fetched successfully!")
 
                 st.info("🔍 Starting summarization...")
                 summarizer.start_background_summarization()
+                qa_bot.start_background_embedding()
                 st.success("📄 Summarization started! Check the 'Summarization' page.")
 
             except Exception as e:
@@ -45,10 +62,21 @@ elif page == "Summarization":
     st.title("📄 Summarized Reddit Data")
     try:
         is_processing, summary, error = summarizer.get_summarization_status()
+        job = summarizer.get_summarization_job()
+        # Saved by the pipeline or a finished job for the current data; shown whenever it exists
+        precomputed = summarizer.load_summary()
         if is_processing:
-            st.info("⏳ Summarization is in progress. You can explore other options...")
+            done, total = job.progress
+            st.info(f"⏳ Summarization is in progress ({done}/{total} clusters, {job.elapsed:.0f}s). You can explore other options...")
+            if st.button("⏹️ Cancel Summarization"):
+                job.cancel()
+        elif job is not None and job.status == "cancelled":
+            st.warning("⚠️ Summarization was cancelled.")
         elif error:
             st.error(f"❌ Error during summarization: {error}")
+        elif precomputed:
+            st.caption("📦 Loaded from precomputed results.")
+            st.write(precomputed)
         elif summary:
             st.success("✅ Summarization completed!")
             st.write(summary)
@@ -60,10 +88,26 @@ elif page == "Summarization":
 elif page == "Sentiment Analysis":
     st.title("📊 Sentiment Analysis")
 
-    if st.button("🔍 Start Sentiment Analysis"):
+    # Results saved for the current data (by the pipeline or an earlier run) are shown as is
+    precomputed = sentiment_analysis.load_sentiment_results()
+    job = sentiment_analysis.get_sentiment_job()
+
+    if precomputed is None and (job is None or not job.in_flight) and st.button("🔍 Start Sentiment Analysis"):
+        if not storage.dataset_exists():
+            st.error("⚠️ No data available. Please fetch Reddit data first.")
+        else:
+            job = sentiment_analysis.start_background_sentiment_analysis()
+
+    if job is not None and job.in_flight:
+        done, total = job.progress
+        st.info(f"⏳ Analyzing sentiments in the background ({done}/{total} stages, {job.elapsed:.0f}s)...")
+    elif precomputed is not None:
+        sentiment_analysis.display_sentiment_analysis(precomputed)
+    elif job is not None and job.status == "failed":
+        st.error(f"❌ Error during sentiment analysis: {job.error}")
+    elif job is not None and job.result is not None:
         try:
-            with st.spinner("⏳ Analyzing sentiments..."):
-                sentiment_analysis.display_sentiment_analysis()
+            sentiment_analysis.display_sentiment_analysis(job.result)
         except Exception as e:
             st.error(f"❌ Error during sentiment analysis: {str(e)}")
 
@@ -0,0 +1,45 @@
+import re
+from collections import defaultdict
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+class PhraseIndex:
+    """Token -> comment-id postings over lowercased comments, for phrase lookups.
+
+    A lookup intersects the postings of the phrase's tokens (shortest list first)
+    and confirms the phrase on the few surviving candidates, so its cost depends
+    on how many comments share the rarest token, not on the corpus size.
+    """
+
+    def __init__(self, texts):
+        self.texts = list(texts)
+        self.lowered = [text.lower() for text in self.texts]
+        postings = defaultdict(list)
+        for doc_id, text in enumerate(self.lowered):
+            for token in set(TOKEN_PATTERN.findall(text)):
+                postings[token].append(doc_id)
+        self.postings = dict(postings)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def lookup_ids(self, phrase):
+        phrase = phrase.lower()
+        tokens = set(TOKEN_PATTERN.findall(phrase))
+        if not tokens:
+            return [doc_id for doc_id, text in enumerate(self.lowered) if phrase in text]
+
+        lists = sorted((self.postings.get(token, []) for token in tokens), key=len)
+        candidates = set(lists[0])
+        for posting in lists[1:]:
+            if not candidates:
+                break
+            candidates.intersection_update(posting)
+
+        # Whole words only: "battery" must not match inside "batteryless"
+        pattern = re.compile(r"(?<!\w)" + re.escape(phrase) + r"(?!\w)")
+        return [doc_id for doc_id in sorted(candidates) if pattern.search(self.lowered[doc_id])]
+
+    def lookup(self, phrase):
+        """Comments containing `phrase` as whole words (case-insensitive), in their original order."""
+        return [self.texts[doc_id] for doc_id in self.lookup_ids(phrase)]
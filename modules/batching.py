@@ -0,0 +1,23 @@
+def token_budget_batches(lengths, max_tokens=8192, max_batch_size=256):
+    """Group item indices into batches whose padded size stays under a token budget.
+
+    Items are sorted by length (longest first) so each batch pads to a similar
+    length. A batch's padded cost is `len(batch) * longest_item`. Returns a list
+    of index lists; callers scatter results back to the original order.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+
+    batches = []
+    batch = []
+    batch_max = 0
+    for i in order:
+        length = max(lengths[i], 1)
+        longest = max(batch_max, length)
+        if batch and (longest * (len(batch) + 1) > max_tokens or len(batch) >= max_batch_size):
+            batches.append(batch)
+            batch, longest = [], length
+        batch.append(i)
+        batch_max = longest
+    if batch:
+        batches.append(batch)
+    return batches
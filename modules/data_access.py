@@ -0,0 +1,73 @@
+import os
+import json
+import threading
+import pandas as pd
+from modules import storage
+
+SENTIMENT_FILE = "data/reddit_sentiment_analysis.csv"
+SENTIMENT_META_FILE = "data/reddit_sentiment_analysis.json"
+
+_cache = {}
+_lock = threading.Lock()
+
+def _file_version(path):
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return f"{path}:{stat.st_mtime_ns}:{stat.st_size}"
+
+def sentiment_meta():
+    if not os.path.exists(SENTIMENT_META_FILE):
+        return {}
+    with open(SENTIMENT_META_FILE, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+def _sentiment_version():
+    # The sentiment file is only valid for the dataset it was computed from
+    if sentiment_meta().get("dataset_version") != storage.dataset_version():
+        return None
+    return _file_version(SENTIMENT_FILE)
+
+def _loaders():
+    return {
+        "posts": (storage.dataset_version, lambda columns: storage.read_posts(columns)),
+        "comments": (storage.dataset_version, lambda columns: storage.read_comments(columns)),
+        "joined": (storage.dataset_version, lambda columns: storage.read_joined(columns)),
+        "sentiment": (_sentiment_version, lambda columns: pd.read_csv(SENTIMENT_FILE, usecols=columns)),
+    }
+
+def dataset_version(name):
+    version_fn, _ = _loaders()[name]
+    return version_fn()
+
+def load_dataset(name, columns=None):
+    """Load `name` ("posts", "comments", "joined" or "sentiment") once per on-disk version.
+
+    Entries are keyed by the files' path, mtime and size, so rewritten files are
+    never served stale. Callers get a shallow copy and must not modify values in
+    place; adding or replacing columns on the copy is fine.
+    Returns None when the dataset does not exist, or for "sentiment" when it was
+    computed from a different version of the Reddit data.
+    """
+    version_fn, read_fn = _loaders()[name]
+    version = version_fn()
+    if version is None or (name != "sentiment" and not storage.dataset_exists()):
+        return None
+
+    key = (name, version, tuple(columns) if columns is not None else None)
+    with _lock:
+        df = _cache.get(key)
+    if df is None:
+        df = read_fn(list(columns) if columns is not None else None)
+        with _lock:
+            # Older versions of the same dataset can never be served again
+            for stale in [k for k in _cache if k[0] == name and k[1] != version]:
+                del _cache[stale]
+            _cache[key] = df
+    return df.copy(deep=False)
+
+def invalidate(name=None):
+    """Drop cached datasets (all of them, or only `name`). Call after writing new data files."""
+    with _lock:
+        for key in [k for k in _cache if name is None or k[0] == name]:
+            del _cache[key]
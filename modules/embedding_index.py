@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import uuid
+import threading
+import numpy as np
+
+INDEX_DIR = "data/embedding_index"
+# Each write produces a new matrix file named by its generation; the sidecar names the current one
+EMBEDDINGS_FILE = "embeddings-{generation}.npy"
+SIDECAR_FILE = "sentences.json"
+SEARCH_CHUNK_ROWS = 65536
+
+# The background embedding job and the pipeline's embeddings stage may update the index at once
+_write_lock = threading.Lock()
+
+def sentence_hash(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def cosine_scores(embeddings, query_vector):
+    """Dot product of a normalised query against `embeddings`, computed in float32 chunks."""
+    query = _normalize(query_vector).reshape(-1)
+    scores = np.empty(len(embeddings), dtype=np.float32)
+    for start in range(0, len(embeddings), SEARCH_CHUNK_ROWS):
+        block = np.asarray(embeddings[start:start + SEARCH_CHUNK_ROWS], dtype=np.float32)
+        scores[start:start + len(block)] = block @ query
+    return scores
+
+class EmbeddingIndex:
+    """Sentence embeddings persisted as a memory-mapped matrix with an id -> text sidecar.
+
+    Rows are keyed by a content hash of each sentence, so updating the index with a
+    new dataset only embeds sentences that were not already stored. Vectors are
+    L2-normalised on write, which makes cosine similarity a plain dot product.
+    Every update writes a new matrix file and then swaps in the sidecar naming it,
+    so a reader always pairs a sidecar with the matrix it was written with.
+    """
+
+    def __init__(self, index_dir=INDEX_DIR, signature=None, dtype="float16"):
+        self.index_dir = index_dir
+        self.signature = signature
+        self.dtype = np.dtype(dtype)
+        self.sentences = []
+        self.hashes = []
+        self.embeddings = None
+        self._load()
+
+    def embeddings_path(self, generation):
+        return os.path.join(self.index_dir, EMBEDDINGS_FILE.format(generation=generation))
+
+    @property
+    def sidecar_path(self):
+        return os.path.join(self.index_dir, SIDECAR_FILE)
+
+    def __len__(self):
+        return len(self.sentences)
+
+    def _load(self):
+        if not (os.path.exists(self.sidecar_path) and os.path.exists(self.embeddings_path)):
+            return
+
+        with open(self.sidecar_path, "r", encoding="utf-8") as file:
+            sidecar = json.load(file)
+
+        # An index built by a different model or at a different precision is unusable.
+        if sidecar.get("signature") != self.signature or sidecar.get("dtype") != self.dtype.name:
+            return
+
+        generation = sidecar.get("generation")
+        if generation is None or not os.path.exists(self.embeddings_path(generation)):
+            return
+        embeddings = np.load(self.embeddings_path(generation), mmap_mode="r")
+        if embeddings.shape[0] != len(sidecar["hashes"]):
+            return
+
+        self.sentences = sidecar["sentences"]
+        self.hashes = sidecar["hashes"]
+        self.embeddings = embeddings
+
+    def update(self, sentences, embed_fn):
+        """Sync the index with `sentences`, embedding only new or changed ones.
+
+        `embed_fn` takes a list of strings and returns a (n, dim) array.
+        Returns the number of sentences that had to be embedded.
+        """
+        with _write_lock:
+            # Start from whatever another writer committed since this index was opened
+            self._load()
+            return self._update(sentences, embed_fn)
+
+    def _update(self, sentences, embed_fn):
+        unique = {}
+        for sentence in sentences:
+            unique.setdefault(sentence_hash(sentence), sentence)
+
+        if list(unique) == self.hashes:
+            return 0
+
+        existing = {h: row for row, h in enumerate(self.hashes)}
+        missing = [(h, text) for h, text in unique.items() if h not in existing]
+        new_vectors = _normalize(embed_fn([text for _, text in missing])) if missing else None
+
+        if new_vectors is not None:
+            dim = new_vectors.shape[1]
+        elif self.embeddings is not None:
+            dim = self.embeddings.shape[1]
+        else:
+            dim = 0
+        # `missing` follows the order of `unique`, so new vectors fill the new rows in sequence
+        is_new = np.fromiter((h not in existing for h in unique), dtype=bool, count=len(unique))
+        kept_rows = np.fromiter((existing[h] for h in unique if h in existing), dtype=np.int64)
+
+        os.makedirs(self.index_dir, exist_ok=True)
+        generation = uuid.uuid4().hex
+        matrix = np.lib.format.open_memmap(self.embeddings_path(generation), mode="w+", dtype=self.dtype,
+                                           shape=(len(unique), dim))
+        if new_vectors is not None:
+            matrix[is_new] = new_vectors
+        if len(kept_rows):
+            matrix[~is_new] = self.embeddings[kept_rows]
+        matrix.flush()
+        del matrix
+
+        # Replacing the sidecar is the commit point: until then readers keep the previous generation
+        sidecar = {
+            "signature": self.signature,
+            "dtype": self.dtype.name,
+            "generation": generation,
+            "hashes": list(unique),
+            "sentences": list(unique.values()),
+        }
+        tmp_path = f"{self.sidecar_path}.{generation}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(sidecar, file)
+        os.replace(tmp_path, self.sidecar_path)
+
+        self.embeddings = None
+        self._remove_stale(generation)
+        self._load()
+        return len(missing)
+
+    def _remove_stale(self, generation):
+        current = EMBEDDINGS_FILE.format(generation=generation)
+        prefix, suffix = EMBEDDINGS_FILE.split("{generation}")
+        for name in os.listdir(self.index_dir):
+            if name != current and name.startswith(prefix) and name.endswith(suffix):
+                try:
+                    os.remove(os.path.join(self.index_dir, name))
+                except OSError:
+                    # Still mapped by a reader on a platform that refuses to delete open files
+                    pass
+
+    def vectors_for(self, texts, embed_fn):
+        """Normalised vectors for `texts`: stored rows where available, `embed_fn` for the rest.
+
+        Unlike `update`, this never modifies the index on disk.
+        """
+        rows = {h: row for row, h in enumerate(self.hashes)}
+        keys = [sentence_hash(text) for text in texts]
+        missing = [i for i, key in enumerate(keys) if key not in rows]
+
+        dim = self.embeddings.shape[1] if self.embeddings is not None else None
+        computed = _normalize(embed_fn([texts[i] for i in missing])) if missing else None
+        if dim is None:
+            dim = computed.shape[1] if computed is not None else 0
+
+        vectors = np.empty((len(texts), dim), dtype=np.float32)
+        found = [i for i, key in enumerate(keys) if key in rows]
+        if found:
+            vectors[found] = self.embeddings[np.array([rows[keys[i]] for i in found])]
+        if missing:
+            vectors[missing] = computed
+        return vectors
+
+    def similarities(self, query_vector):
+        """Cosine similarity of `query_vector` against every stored sentence."""
+        if self.embeddings is None:
+            return np.empty(0, dtype=np.float32)
+        return cosine_scores(self.embeddings, query_vector)
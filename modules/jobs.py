@@ -0,0 +1,136 @@
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = 2
+# Finished jobs kept for status lookups; the newest job of each name is always kept
+MAX_FINISHED_JOBS = 20
+
+class JobCancelled(Exception):
+    pass
+
+class Job:
+    """A unit of background work with progress, timing and cooperative cancellation.
+
+    The job function receives the Job as its first argument and should call
+    `report_progress` as it goes and `check_cancelled` between steps.
+    """
+
+    def __init__(self, job_id, name, key):
+        self.id = job_id
+        self.name = name
+        self.key = key
+        self.status = "queued"
+        self.progress = (0, 0)
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def in_flight(self):
+        return self.status in ("queued", "running")
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def report_progress(self, done, total):
+        self.progress = (done, total)
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled(f"Job {self.id} ({self.name}) was cancelled.")
+
+    def cancel(self):
+        self._cancel_event.set()
+        # A job that hasn't started yet can be dropped from the queue outright
+        if self.future is not None and self.future.cancel():
+            self.status = "cancelled"
+            self.finished_at = time.time()
+
+    def snapshot(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "status": self.status,
+            "progress": self.progress,
+            "elapsed": self.elapsed,
+            "error": self.error,
+        }
+
+class JobManager:
+    """Bounded worker pool for long jobs, de-duplicating identical in-flight work by key."""
+
+    def __init__(self, max_workers=JOB_WORKERS, max_finished=MAX_FINISHED_JOBS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._max_finished = max_finished
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.check_cancelled()
+            job.result = fn(job, *args, **kwargs)
+            job.status = "done"
+        except JobCancelled:
+            job.status = "cancelled"
+        except Exception as e:
+            logger.exception("Job %s (%s) failed", job.id, job.name)
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            logger.info("Job %s (%s) %s in %.2fs", job.id, job.name, job.status, job.elapsed)
+
+    def submit(self, name, fn, *args, key=None, **kwargs):
+        """Run `fn(job, *args, **kwargs)` on the pool; returns the existing job if `key` is in flight."""
+        key = key if key is not None else name
+        with self._lock:
+            for job in self._jobs.values():
+                if job.key == key and job.in_flight:
+                    return job
+            job = Job(next(self._ids), name, key)
+            self._jobs[job.id] = job
+            job.future = self._executor.submit(self._run, job, fn, args, kwargs)
+            self._prune()
+            return job
+
+    def _prune(self):
+        # Oldest first: `_jobs` is in submission order. Called with the lock held.
+        newest = {job.name: job.id for job in self._jobs.values()}
+        finished = [job.id for job in self._jobs.values() if not job.in_flight and newest[job.name] != job.id]
+        for job_id in finished[:max(len(finished) - self._max_finished, 0)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def latest(self, name):
+        with self._lock:
+            matching = [job for job in self._jobs.values() if job.name == name]
+        return max(matching, key=lambda job: job.id) if matching else None
+
+    def cancel(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is not None:
+            job.cancel()
+        return job
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+job_manager = JobManager()
@@ -0,0 +1,193 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# All models are bundled under models/; never reach out to the Hugging Face Hub. Both are
+# read when transformers is imported, so loaders import this module before transformers.
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+# Logical model names and the directories they are bundled in. Everything loads from
+# disk, so the app runs without network access.
+MODELS_DIR = "./models"
+LOCAL_MODELS = {
+    "embedding": "bert_model",
+    "qa": "qa_model",
+    "sentiment": "sentiment_model",
+    "summarizer": "summarizer_model",
+}
+CHECKSUM_FILE = os.path.join(MODELS_DIR, "checksums.json")
+LFS_POINTER_PREFIX = b"version https://git-lfs.github.com/spec/"
+# Worker processes load models their parent has already verified and turn this off
+VERIFY_CHECKSUMS = True
+
+# name -> (directory, (file, checksum, mtime, size)...) of the last files that passed verification
+_verified = {}
+
+class ModelIntegrityError(Exception):
+    pass
+
+def model_path(name):
+    return os.path.join(MODELS_DIR, LOCAL_MODELS[name])
+
+def file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _load_checksums(path=CHECKSUM_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+def write_checksums(names=None, path=CHECKSUM_FILE):
+    """Record the SHA-256 of every file of the given bundled models (default: all present)."""
+    checksums = _load_checksums(path)
+    for name in names or LOCAL_MODELS:
+        directory = model_path(name)
+        if os.path.isdir(directory):
+            checksums[name] = {file: file_checksum(os.path.join(directory, file)) for file in sorted(os.listdir(directory))
+                               if os.path.isfile(os.path.join(directory, file))}
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(checksums, file, indent=2, sort_keys=True)
+    return checksums
+
+def verify_model(name):
+    """Check a bundled model's files against CHECKSUM_FILE; raises ModelIntegrityError on a mismatch.
+
+    Returns False (after a warning) if no checksums were recorded for `name`. Files are
+    only hashed again when their modification time or size changed since they passed.
+    """
+    expected = _load_checksums().get(name)
+    directory = model_path(name)
+    if not os.path.isdir(directory):
+        raise ModelIntegrityError(f"Model '{name}' not found at {directory}. Run setup_project.py or restore models/.")
+    if expected is None:
+        logger.warning("No checksums recorded for model '%s'; skipping verification", name)
+        return False
+
+    missing = [file for file in expected if not os.path.exists(os.path.join(directory, file))]
+    if missing:
+        raise ModelIntegrityError(f"Model '{name}' is missing {', '.join(missing)}.")
+    stats = {file: os.stat(os.path.join(directory, file)) for file in sorted(expected)}
+    stamp = (directory, tuple((file, expected[file], stat.st_mtime_ns, stat.st_size) for file, stat in stats.items()))
+    if _verified.get(name) == stamp:
+        return True
+
+    for file, checksum in expected.items():
+        path = os.path.join(directory, file)
+        with open(path, "rb") as handle:
+            if handle.read(len(LFS_POINTER_PREFIX)) == LFS_POINTER_PREFIX:
+                raise ModelIntegrityError(f"{path} is a git-lfs pointer; run `git lfs pull` to fetch the weights.")
+        if file_checksum(path) != checksum:
+            raise ModelIntegrityError(f"Checksum mismatch for {path}.")
+    _verified[name] = stamp
+    return True
+
+def load_pretrained(model_class, path, allow_missing=()):
+    """`model_class.from_pretrained(path)` offline; raises ModelIntegrityError if weights are missing.
+
+    transformers silently initialises missing weights at random, so a bare encoder saved
+    where a task model is expected would load fine and predict noise. Missing keys that
+    start with a prefix in `allow_missing` (e.g. an unused pooler) are tolerated.
+    """
+    model, loading_info = model_class.from_pretrained(path, local_files_only=True, output_loading_info=True)
+    missing = [key for key in loading_info["missing_keys"] if not key.startswith(tuple(allow_missing))]
+    if missing:
+        raise ModelIntegrityError(
+            f"{path} has no weights for {', '.join(missing[:4])}{' ...' if len(missing) > 4 else ''}; "
+            f"it is not a {model_class.__name__} checkpoint. Re-export it with setup_project.py."
+        )
+    model.eval()
+    return model
+
+def local_loader(name, loader):
+    """Loader for a bundled model: verifies its files (unless VERIFY_CHECKSUMS is off), then calls `loader(path)`."""
+    def load():
+        if VERIFY_CHECKSUMS:
+            start = time.perf_counter()
+            verify_model(name)
+            logger.info("Verified %s in %.2fs", name, time.perf_counter() - start)
+        return loader(model_path(name))
+    return load
+
+class ModelHandle:
+    """Lazy, thread-safe, load-once wrapper around a model loader."""
+
+    def __init__(self, name, loader, warm_up=True):
+        self.name = name
+        self.warm_up = warm_up
+        self.load_seconds = None
+        self._loader = loader
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    start = time.perf_counter()
+                    self._value = self._loader()
+                    self.load_seconds = time.perf_counter() - start
+                    self._loaded = True
+                    logger.info("Loaded %s in %.2fs", self.name, self.load_seconds)
+        return self._value
+
+_handles = {}
+_registry_lock = threading.Lock()
+_warm_up_thread = None
+
+def register(name, loader, warm_up=True):
+    """Register a loader under `name`. Re-registering an existing name keeps the first handle."""
+    with _registry_lock:
+        if name not in _handles:
+            _handles[name] = ModelHandle(name, loader, warm_up)
+        return _handles[name]
+
+def get(name):
+    if name not in _handles:
+        raise KeyError(f"No model registered under '{name}'.")
+    return _handles[name].get()
+
+def is_loaded(name):
+    return name in _handles and _handles[name].loaded
+
+def load_times():
+    return {name: handle.load_seconds for name, handle in _handles.items() if handle.loaded}
+
+def warm_up(names=None, background=True):
+    """Load `names` (default: every handle registered with warm_up=True), optionally off-thread.
+
+    Only one background warm-up runs per process; later calls return the same thread.
+    """
+    global _warm_up_thread
+
+    def load_all():
+        for name in names or [n for n, h in list(_handles.items()) if h.warm_up]:
+            try:
+                get(name)
+            except Exception:
+                logger.exception("Warm-up failed for %s", name)
+
+    if not background:
+        load_all()
+        return None
+
+    with _registry_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=load_all, name="model-warm-up", daemon=True)
+            _warm_up_thread.start()
+        return _warm_up_thread
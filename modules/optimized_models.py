@@ -0,0 +1,174 @@
+import os
+import json
+import logging
+import numpy as np
+import torch
+from modules import model_registry  # before transformers: sets the offline defaults
+from transformers.modeling_outputs import BaseModelOutput, SequenceClassifierOutput, QuestionAnsweringModelOutput
+
+logger = logging.getLogger(__name__)
+
+# "fp32" runs the models as shipped; "int8" applies dynamic quantization to their Linear
+# layers at load time; "onnx" runs an exported graph with ONNX Runtime (falls back to fp32 if missing).
+INFERENCE_MODE = os.environ.get("INFERENCE_MODE", "fp32")
+MODES = ("fp32", "int8", "onnx")
+MODELS_DIR = "./models"
+
+# Model outputs each kind of head produces, in export order
+OUTPUTS = {
+    "embedding": (BaseModelOutput, ["last_hidden_state"]),
+    "sentiment": (SequenceClassifierOutput, ["logits"]),
+    "qa": (QuestionAnsweringModelOutput, ["start_logits", "end_logits"]),
+}
+
+# Fixed sample for comparing optimized outputs with fp32
+SAMPLE_TEXTS = [
+    "The battery life on this phone is amazing, easily two days of use.",
+    "Customer support never answered my emails and the refund took months.",
+    "I switched to the new version last week and honestly can't tell the difference.",
+    "Great camera, terrible software updates.",
+    "Does anyone know if the warranty covers water damage?",
+    "This is the worst purchase I have made in years.",
+    "Shipping was fast and the packaging was solid.",
+    "The update fixed the crash but introduced a new bug with notifications.",
+]
+SAMPLE_QUESTION = "What do people think about the battery?"
+
+def variant(name, mode=None):
+    """`name` tagged with the inference mode, for cache keys that must not mix fp32 and optimized outputs."""
+    mode = mode or INFERENCE_MODE
+    return name if mode == "fp32" else f"{name}:{mode}"
+
+def optimized_dir(model_path, mode):
+    """Where the exported `mode` copy of `model_path` is cached: a sibling directory of the original."""
+    name = os.path.basename(os.path.normpath(model_path))
+    parent = os.path.dirname(os.path.normpath(model_path)) if os.path.isdir(model_path) else MODELS_DIR
+    return os.path.join(parent, f"{name}-{mode}")
+
+def quantize_int8(model):
+    """Dynamically quantized copy of `model`.
+
+    Not cached on disk: quantizing takes a fraction of the fp32 load it starts from,
+    and a saved state_dict would still need that fp32 model to load into.
+    """
+    quantized = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    quantized.eval()
+    return quantized
+
+class OnnxModel:
+    """Calls an ONNX Runtime session like the transformers model it was exported from."""
+
+    def __init__(self, session, config, kind):
+        self.session = session
+        self.config = config
+        self.output_class, self.output_names = OUTPUTS[kind]
+        self.input_names = [node.name for node in session.get_inputs()]
+
+    def eval(self):
+        return self
+
+    def __call__(self, **inputs):
+        feed = {name: inputs[name].cpu().numpy().astype(np.int64) for name in self.input_names if name in inputs}
+        outputs = self.session.run(self.output_names, feed)
+        return self.output_class(**{name: torch.from_numpy(value) for name, value in zip(self.output_names, outputs)})
+
+def source_stamp(model_path):
+    """Name, size and mtime of every file of `model_path`; changes whenever the model is re-exported."""
+    if not os.path.isdir(model_path):
+        return []
+    return [[name, os.path.getsize(os.path.join(model_path, name)), os.stat(os.path.join(model_path, name)).st_mtime_ns]
+            for name in sorted(os.listdir(model_path)) if os.path.isfile(os.path.join(model_path, name))]
+
+def export_onnx(model, tokenizer, model_path, kind):
+    """Export `model` to ONNX (next to the original) and return the file path.
+
+    The export is reused until the files in `model_path` change.
+    """
+    path = os.path.join(optimized_dir(model_path, "onnx"), "model.onnx")
+    stamp_path = path + ".json"
+    stamp = source_stamp(model_path)
+    if os.path.exists(path) and os.path.exists(stamp_path):
+        with open(stamp_path, "r", encoding="utf-8") as file:
+            if json.load(file).get("source") == stamp:
+                return path
+        logger.info("%s changed since %s was exported; exporting again", model_path, path)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    dummy = tokenizer(["question", "a short context"], ["a second segment", "another"], return_tensors="pt", padding=True)
+    input_names = [name for name in tokenizer.model_input_names if name in dummy]
+    output_names = OUTPUTS[kind][1]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names + output_names}
+    if kind == "sentiment":
+        dynamic_axes["logits"] = {0: "batch"}
+
+    model.eval()
+    with torch.no_grad():
+        # A trailing dict in the args tuple is passed as keyword arguments
+        torch.onnx.export(
+            model,
+            ({name: dummy[name] for name in input_names},),
+            path + ".tmp",
+            input_names=input_names,
+            output_names=output_names,
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+    os.replace(path + ".tmp", path)
+    with open(stamp_path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump({"source": stamp}, file)
+    os.replace(stamp_path + ".tmp", stamp_path)
+    return path
+
+def load_onnx(model, tokenizer, model_path, kind):
+    import onnxruntime
+    path = export_onnx(model, tokenizer, model_path, kind)
+    options = onnxruntime.SessionOptions()
+    options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+    session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+    return OnnxModel(session, model.config, kind)
+
+def optimize(model, tokenizer, model_path, kind, mode=None):
+    """`model` converted for `mode` (default INFERENCE_MODE); unchanged in fp32 mode."""
+    mode = mode or INFERENCE_MODE
+    if mode not in MODES:
+        raise ValueError(f"Unknown inference mode '{mode}'. Choose from {', '.join(MODES)}.")
+    if mode == "int8":
+        return quantize_int8(model)
+    if mode == "onnx":
+        try:
+            return load_onnx(model, tokenizer, model_path, kind)
+        except ImportError:
+            logger.warning("onnxruntime is not installed, running %s in fp32", model_path)
+    return model
+
+def sample_inputs(tokenizer, kind):
+    if kind == "qa":
+        return tokenizer([SAMPLE_QUESTION] * len(SAMPLE_TEXTS), SAMPLE_TEXTS, padding=True, truncation=True, return_tensors="pt")
+    return tokenizer(SAMPLE_TEXTS, padding=True, truncation=True, return_tensors="pt")
+
+def accuracy_check(reference, optimized, tokenizer, kind):
+    """Compare `optimized` with the fp32 `reference` on SAMPLE_TEXTS.
+
+    Embeddings report the cosine similarity of mean-pooled vectors; classifiers the
+    share of identical predictions and the largest probability difference.
+    """
+    encoded = sample_inputs(tokenizer, kind)
+    inputs = {name: encoded[name] for name in tokenizer.model_input_names if name in encoded}
+    with torch.no_grad():
+        expected = reference(**inputs)
+        actual = optimized(**inputs)
+
+    if kind == "embedding":
+        mask = inputs["attention_mask"].unsqueeze(-1).float()
+        pool = lambda output: (output.last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1)
+        cosine = torch.nn.functional.cosine_similarity(pool(expected), pool(actual), dim=-1)
+        return {"min_cosine": float(cosine.min()), "mean_cosine": float(cosine.mean())}
+
+    report = {}
+    for name in OUTPUTS[kind][1]:
+        expected_probs = torch.softmax(getattr(expected, name), dim=-1)
+        actual_probs = torch.softmax(getattr(actual, name), dim=-1)
+        agreement = (expected_probs.argmax(dim=-1) == actual_probs.argmax(dim=-1)).float().mean()
+        report[f"{name}_agreement"] = float(agreement)
+        report[f"{name}_max_prob_diff"] = float((expected_probs - actual_probs).abs().max())
+    return report
@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from modules import storage, data_access, reddit_data, text_normalize, sentiment_analysis, qa_bot, summarizer
+from modules import embedding_index
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_STATE_FILE = "data/pipeline_state.json"
+PIPELINE_WORKERS = 3
+
+DEFAULT_CONFIG = {
+    "keyword": None,
+    "post_limit": 100,
+    "max_comments": 50,
+    "max_runtime": 60,
+    "summary_mode": summarizer.SUMMARY_MODE,
+    "num_clusters": 5,
+    "cluster_backend": summarizer.CLUSTER_BACKEND,
+    "max_input_length": 1024,
+    "max_summary_length": 150,
+    "min_summary_length": 50,
+    "max_generate_calls": summarizer.MAX_GENERATE_CALLS,
+}
+
+# Config keys that change the summary text, besides the dataset and the model
+SUMMARY_KEYS = ["summary_mode", "num_clusters", "cluster_backend", "max_input_length", "max_summary_length",
+                "min_summary_length", "max_generate_calls"]
+
+class Stage:
+    """One step of the pipeline.
+
+    `run(config)` does the work and returns a JSON-serialisable dict. `fingerprint(config)`
+    describes the stage's inputs; the stage is skipped when it matches the last
+    successful run and every path in `outputs` exists. A None fingerprint means the
+    stage always runs.
+    """
+
+    def __init__(self, name, deps, run, fingerprint, outputs=()):
+        self.name = name
+        self.deps = tuple(deps)
+        self.run = run
+        self.fingerprint = fingerprint
+        self.outputs = tuple(outputs)
+
+def _dataset_fingerprint(*parts):
+    if not storage.dataset_exists():
+        raise RuntimeError("No data available. Fetch Reddit data first (--keyword).")
+    return ":".join([storage.dataset_version()] + [str(part) for part in parts])
+
+def _run_fetch(config):
+    if not config.get("keyword"):
+        return {"status": "skipped", "reason": "no keyword given"}
+    rows = reddit_data.fetch_to_store(
+        keyword=config["keyword"],
+        post_limit=config["post_limit"],
+        max_comments=config["max_comments"],
+        max_runtime=config["max_runtime"],
+    )
+    data_access.invalidate()
+    return {"rows": rows}
+
+def _run_clean(config):
+    cleaned = text_normalize.cleaned_column("comments", "comment_body")
+    return {"comments": 0 if cleaned is None else len(cleaned)}
+
+def _run_sentiment(config):
+    df, stats = sentiment_analysis.compute_sentiment_dataset()
+    if df is None:
+        return {"comments": 0, "classified": 0}
+    return {"comments": len(df), "classified": stats["classified"]}
+
+def _run_aspects(config):
+    aspects = sentiment_analysis.compute_aspect_results()
+    return {"aspects": len(aspects or {})}
+
+def _run_embeddings(config):
+    tokenizer, model = qa_bot.load_embedding_model()
+    index = qa_bot.build_embedding_index(qa_bot.load_sentences(), tokenizer, model)
+    return {"sentences": len(index)}
+
+def _run_summary(config):
+    timings = {}
+    summary = summarizer.summarize_content(
+        max_input_length=config["max_input_length"],
+        max_summary_length=config["max_summary_length"],
+        min_summary_length=config["min_summary_length"],
+        num_clusters=config["num_clusters"],
+        mode=config["summary_mode"],
+        max_generate_calls=config["max_generate_calls"],
+        cluster_backend=config["cluster_backend"],
+        timings=timings,
+    )
+    return {"characters": len(summary), "timings": timings}
+
+STAGES = [
+    Stage("fetch", [], _run_fetch, lambda config: None),
+    Stage("clean", ["fetch"], _run_clean, lambda config: _dataset_fingerprint(),
+          [text_normalize.cleaned_path("comments", "comment_body", "summary")]),
+    Stage("sentiment", ["fetch"], _run_sentiment,
+          lambda config: _dataset_fingerprint(sentiment_analysis.SENTIMENT_MODEL_KEY),
+          [sentiment_analysis.SENTIMENT_FILE, sentiment_analysis.SENTIMENT_META_FILE]),
+    Stage("aspects", ["sentiment"], _run_aspects,
+          lambda config: _dataset_fingerprint(data_access.dataset_version("sentiment"), sentiment_analysis.ASPECT_MODE),
+          [sentiment_analysis.ASPECT_RESULTS_FILE]),
+    Stage("embeddings", ["fetch"], _run_embeddings,
+          lambda config: _dataset_fingerprint(qa_bot.EMBEDDING_SIGNATURE),
+          [os.path.join(embedding_index.INDEX_DIR, embedding_index.SIDECAR_FILE)]),
+    Stage("summary", ["clean"], _run_summary,
+          lambda config: _dataset_fingerprint(summarizer.SUMMARIZER_MODEL, *(config[key] for key in SUMMARY_KEYS)),
+          [summarizer.SUMMARY_FILE, summarizer.SUMMARY_META_FILE]),
+]
+
+def _load_state(path=PIPELINE_STATE_FILE):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+def _write_state(state, path=PIPELINE_STATE_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(state, file, indent=2)
+    os.replace(path + ".tmp", path)
+
+def run_pipeline(config=None, stages=None, force=(), max_workers=PIPELINE_WORKERS, state_path=PIPELINE_STATE_FILE):
+    """Run the selected stages (default: all) in dependency order and return a report per stage.
+
+    Stages whose dependencies are satisfied run concurrently on `max_workers` threads;
+    unselected dependencies count as satisfied. Stages named in `force` run even when
+    their inputs are unchanged. A failed stage blocks the stages that depend on it.
+    """
+    config = {**DEFAULT_CONFIG, **(config or {})}
+    selected = {stage.name: stage for stage in STAGES if stages is None or stage.name in stages}
+    state = _load_state(state_path)
+    state_lock = threading.Lock()
+    report = {}
+
+    def run_stage(stage):
+        start = time.perf_counter()
+        fingerprint = stage.fingerprint(config)
+        if (fingerprint is not None and stage.name not in force and state.get(stage.name) == fingerprint
+                and all(os.path.exists(path) for path in stage.outputs)):
+            return {"status": "cached", "seconds": time.perf_counter() - start}
+
+        logger.info("Running stage %s", stage.name)
+        result = {"status": "done", **stage.run(config)}
+        result["seconds"] = time.perf_counter() - start
+        if fingerprint is not None and result["status"] == "done":
+            with state_lock:
+                state[stage.name] = fingerprint
+                _write_state(state, state_path)
+        return result
+
+    pending = dict(selected)
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline") as executor:
+        while pending or running:
+            for stage in list(pending.values()):
+                deps = [report.get(dep, {}).get("status") for dep in stage.deps if dep in selected]
+                if any(status in ("failed", "blocked") for status in deps):
+                    report[stage.name] = {"status": "blocked"}
+                    del pending[stage.name]
+                elif all(status in ("done", "cached", "skipped") for status in deps):
+                    running[executor.submit(run_stage, stage)] = stage
+                    del pending[stage.name]
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = running.pop(future)
+                try:
+                    report[stage.name] = future.result()
+                except Exception as e:
+                    logger.exception("Stage %s failed", stage.name)
+                    report[stage.name] = {"status": "failed", "error": str(e)}
+                logger.info("Stage %s %s", stage.name, report[stage.name]["status"])
+
+    return {name: report[name] for name in selected}
@@ -1,54 +1,197 @@
-import os
-import pandas as pd
+import functools
+import numpy as np
 import torch
-from transformers import AutoTokenizer, AutoModel, pipeline
+from modules import model_registry
+from transformers import AutoTokenizer, AutoModel, AutoModelForQuestionAnswering
 import streamlit as st
-from sentence_transformers import util
+from modules.embedding_index import EmbeddingIndex
+from modules.retrieval import ExactRetriever, get_retriever
+from modules.batching import token_budget_batches
+from modules import storage, data_access, jobs, sharded_inference, optimized_models
 
-# Paths to locally stored models
-BERT_MODEL_PATH = "./models/bert_model"
-QA_MODEL_PATH = "./models/qa_model"
+# Paths to the bundled models (see model_registry.LOCAL_MODELS)
+BERT_MODEL_PATH = model_registry.model_path("embedding")
+QA_MODEL_PATH = model_registry.model_path("qa")
 
-@st.cache_resource(show_spinner=False)
-def load_embedding_model(model_path):
-    tokenizer = AutoTokenizer.from_pretrained(model_path)
-    model = AutoModel.from_pretrained(model_path)
-    return tokenizer, model
+# Padded tokens per forward pass when embedding; also part of the index signature
+# so vectors produced with a different pooling scheme are never mixed.
+EMBEDDING_TOKEN_BUDGET = 8192
+EMBEDDING_SIGNATURE = optimized_models.variant(f"{BERT_MODEL_PATH}:masked-mean")
 
-@st.cache_resource(show_spinner=False)
-def load_qa_pipeline(model_path):
-    return pipeline("question-answering", model=model_path, tokenizer=model_path)
+# "auto" keeps exact search for small corpora and switches to IVF above the threshold
+RETRIEVER_BACKEND = "auto"
+ANN_THRESHOLD = 100000
 
-def compute_embeddings(sentences, tokenizer, model):
+def _load_embedding_model(model_path):
+    tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+    # Embeddings are mean-pooled, so a checkpoint without pooler weights is fine
+    model = model_registry.load_pretrained(AutoModel, model_path, allow_missing=("pooler.",))
+    return tokenizer, optimized_models.optimize(model, tokenizer, model_path, "embedding")
+
+def _load_qa_model(model_path):
+    tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+    model = model_registry.load_pretrained(AutoModelForQuestionAnswering, model_path)
+    return tokenizer, optimized_models.optimize(model, tokenizer, model_path, "qa")
+
+model_registry.register("embedding", model_registry.local_loader("embedding", _load_embedding_model))
+model_registry.register("qa", model_registry.local_loader("qa", _load_qa_model))
+
+def load_embedding_model():
+    return model_registry.get("embedding")
+
+def load_qa_model():
+    return model_registry.get("qa")
+
+def mean_pool(last_hidden_state, attention_mask):
+    # Average over real tokens only, so padding never leaks into the embedding
+    mask = attention_mask.unsqueeze(-1).to(last_hidden_state.dtype)
+    return (last_hidden_state * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+
+def compute_embeddings(sentences, tokenizer, model, max_tokens=EMBEDDING_TOKEN_BUDGET):
     
-    batch_size = 16  # Process sentences in batches
-    all_embeddings = []
+    if not sentences:
+        return torch.empty(0, model.config.hidden_size)
+
+    # Tokenize once without padding, then pad per length-sorted batch under a token budget
+    encoded = tokenizer(list(sentences), truncation=True)
+    input_names = [name for name in tokenizer.model_input_names if name in encoded]
+    lengths = [len(ids) for ids in encoded["input_ids"]]
 
-    for i in range(0, len(sentences), batch_size):
-        batch = sentences[i:i+batch_size]
-        encoded_input = tokenizer(batch, padding=True, truncation=True, return_tensors='pt')
+    all_embeddings = torch.empty(len(sentences), model.config.hidden_size)
+    for batch in token_budget_batches(lengths, max_tokens):
+        features = [{name: encoded[name][i] for name in input_names} for i in batch]
+        encoded_input = tokenizer.pad(features, return_tensors='pt')
         with torch.no_grad():
             model_output = model(**encoded_input)
-        embeddings = model_output.last_hidden_state.mean(dim=1)  # Average pooling
-        all_embeddings.append(embeddings)
+        all_embeddings[batch] = mean_pool(model_output.last_hidden_state, encoded_input["attention_mask"])
+
+    return all_embeddings
+
+def embed_texts(sentences, tokenizer, model):
+    """Embeddings as a numpy array, sharded across worker processes for large inputs."""
+    if sharded_inference.should_shard(len(sentences)):
+        return np.stack(sharded_inference.get_executor("embedding").map(sentences))
+    return compute_embeddings(sentences, tokenizer, model).numpy()
+
+def build_embedding_index(sentences, tokenizer, model):
+    # Only sentences not already in the on-disk index are run through the model
+    index = EmbeddingIndex(signature=EMBEDDING_SIGNATURE)
+    index.update(sentences, lambda batch: embed_texts(batch, tokenizer, model))
+    return index
+
+def load_sentences():
+    # Each post's content is read once from the posts table, not once per comment row
+    posts = data_access.load_dataset("posts", ['post_content'])
+    comments = data_access.load_dataset("comments", ['comment_body'])
+    return posts['post_content'].dropna().astype(str).tolist() + comments['comment_body'].dropna().astype(str).tolist()
+
+# Kept per process without Streamlit so the batch pipeline can share these loaders
+@functools.lru_cache(maxsize=2)
+def load_embedding_index(data_version):
+    sentences = load_sentences()
+    tokenizer, model = load_embedding_model()
+    return build_embedding_index(sentences, tokenizer, model)
+
+def _embedding_job(job):
+    sentences = load_sentences()
+    tokenizer, model = load_embedding_model()
+    job.report_progress(0, len(sentences))
+    index = build_embedding_index(sentences, tokenizer, model)
+    job.report_progress(len(sentences), len(sentences))
+    return len(index)
+
+def start_background_embedding():
+    """Bring the embedding index up to date for the current dataset off the UI thread."""
+    key = ("embedding", storage.dataset_version() if storage.dataset_exists() else None)
+    return jobs.job_manager.submit("embedding", _embedding_job, key=key)
 
-    return torch.cat(all_embeddings, dim=0)
+def build_retriever(index, backend=RETRIEVER_BACKEND):
+    if backend == "auto":
+        backend = "ivf" if len(index) > ANN_THRESHOLD else "exact"
+    embeddings = index.embeddings if index.embeddings is not None else np.empty((0, 0), dtype=np.float32)
+    return get_retriever(backend).build(embeddings)
 
-def get_top_k_unique_answers(question, sentences, tokenizer, embedding_model, qa_pipeline, top_k=10):
+@functools.lru_cache(maxsize=4)
+def load_retriever(data_version, backend=RETRIEVER_BACKEND):
+    return build_retriever(load_embedding_index(data_version), backend)
+
+def extract_answers(question, contexts, qa_tokenizer, qa_model, max_length=384, doc_stride=128,
+                    max_answer_length=15, batch_size=32):
+    """Best answer span for each context, read in padded batches instead of one pipeline call each.
+
+    Long contexts are split into overlapping windows (`doc_stride` tokens of overlap);
+    the highest-scoring span over all windows of a context wins.
+    """
+    if not contexts:
+        return []
+
+    encoded = qa_tokenizer(
+        [question] * len(contexts),
+        contexts,
+        truncation="only_second",
+        max_length=max_length,
+        stride=doc_stride,
+        return_overflowing_tokens=True,
+        return_offsets_mapping=True,
+        padding=True,
+        return_tensors="pt",
+    )
+    sample_map = encoded["overflow_to_sample_mapping"].tolist()
+    offsets = encoded["offset_mapping"].tolist()
+    model_inputs = {name: encoded[name] for name in qa_tokenizer.model_input_names if name in encoded}
+
+    start_logits, end_logits = [], []
+    with torch.no_grad():
+        for i in range(0, len(sample_map), batch_size):
+            output = qa_model(**{name: tensor[i:i + batch_size] for name, tensor in model_inputs.items()})
+            start_logits.append(output.start_logits)
+            end_logits.append(output.end_logits)
+    start_logits = torch.cat(start_logits)
+    end_logits = torch.cat(end_logits)
+
+    # Only spans that start and end inside the context, in order, and not too long
+    seq_len = start_logits.shape[1]
+    span_mask = torch.triu(torch.ones(seq_len, seq_len, dtype=torch.bool))
+    span_mask &= ~torch.triu(torch.ones(seq_len, seq_len, dtype=torch.bool), diagonal=max_answer_length)
+
+    best = [(-float("inf"), "") for _ in contexts]
+    for feature, context_idx in enumerate(sample_map):
+        in_context = torch.tensor([sid == 1 for sid in encoded.sequence_ids(feature)])
+        if not in_context.any():
+            continue
+
+        # Normalise per window, as the pipeline does, so scores are comparable across windows
+        start = torch.log_softmax(start_logits[feature].masked_fill(~in_context, -1e4), dim=-1)
+        end = torch.log_softmax(end_logits[feature].masked_fill(~in_context, -1e4), dim=-1)
+        scores = (start[:, None] + end[None, :]).masked_fill(~span_mask, -float("inf"))
+        scores = scores.masked_fill(~(in_context[:, None] & in_context[None, :]), -float("inf"))
+
+        flat = int(torch.argmax(scores))
+        start_idx, end_idx = divmod(flat, seq_len)
+        score = float(scores[start_idx, end_idx])
+        if score > best[context_idx][0]:
+            char_start = offsets[feature][start_idx][0]
+            char_end = offsets[feature][end_idx][1]
+            best[context_idx] = (score, contexts[context_idx][char_start:char_end])
+
+    return [answer for _, answer in best]
+
+def get_top_k_unique_answers(question, index, tokenizer, embedding_model, qa_tokenizer, qa_model, top_k=10, retriever=None):
     
-    question_embedding = compute_embeddings([question], tokenizer, embedding_model).squeeze()
-    sentence_embeddings = compute_embeddings(sentences, tokenizer, embedding_model)
+    if retriever is None:
+        retriever = ExactRetriever().build(index.embeddings)
 
-    similarities = util.pytorch_cos_sim(question_embedding, sentence_embeddings).squeeze()
-    top_indices = torch.argsort(similarities, descending=True)[:top_k * 2]  # Retrieve more to filter duplicates
+    question_embedding = compute_embeddings([question], tokenizer, embedding_model).squeeze().numpy()
+    top_indices, _ = retriever.search(question_embedding, top_k * 2)  # Retrieve more to filter duplicates
+
+    contexts = [index.sentences[idx] for idx in top_indices]
+    answers = extract_answers(question, contexts, qa_tokenizer, qa_model)
 
     unique_answers = []
     seen_answers = set()
 
-    for index in top_indices:
-        context = sentences[index]
-        result = qa_pipeline({"context": context, "question": question})
-        answer = result["answer"].strip()
+    for context, answer in zip(contexts, answers):
+        answer = answer.strip()
 
         if answer and answer.lower() not in seen_answers:
             unique_answers.append({"answer": answer, "context": context})
@@ -64,33 +207,40 @@ def display_qa_bot():
     st.title("Reddit Q&A Bot")
 
     # Load Data
-    data_path = "data/reddit_data.csv"
-    if not os.path.exists(data_path):
-        st.error("Data file not found. Please ensure 'reddit_data.csv' exists in the 'data' directory.")
+    if not storage.dataset_exists():
+        st.error("Data not found. Please fetch Reddit data first.")
         return
 
-    df = pd.read_csv(data_path)
-    if df.empty or 'post_content' not in df or 'comment_body' not in df:
-        st.error("Invalid or empty data file. Ensure 'post_content' and 'comment_body' columns exist.")
+    data_version = storage.dataset_version()
+    if not storage.store_exists():
+        st.error("Invalid or empty dataset. Ensure posts and comments were fetched.")
         return
 
-    sentences = df['post_content'].dropna().tolist() + df['comment_body'].dropna().tolist()
+    embedding_job = jobs.job_manager.latest("embedding")
+    if embedding_job is not None and embedding_job.in_flight:
+        _, total = embedding_job.progress
+        st.info(f"⏳ Building the embedding index for {total} sentences. Please check back shortly.")
+        return
 
     # Load models
     st.write("Loading models...")
     try:
-        tokenizer, embedding_model = load_embedding_model(BERT_MODEL_PATH)
-        qa_pipeline = load_qa_pipeline(QA_MODEL_PATH)
+        tokenizer, embedding_model = load_embedding_model()
+        qa_tokenizer, qa_model = load_qa_model()
     except Exception as e:
         st.error(f"Error loading models: {str(e)}")
         return
 
+    # Embeddings are computed once per dataset, not once per question
+    index = load_embedding_index(data_version)
+    retriever = load_retriever(data_version)
+
     # User Input
     question = st.text_input("Enter your question:")
     if question:
         try:
             st.write("Finding relevant answers...")
-            top_answers = get_top_k_unique_answers(question, sentences, tokenizer, embedding_model, qa_pipeline, top_k=5)
+            top_answers = get_top_k_unique_answers(question, index, tokenizer, embedding_model, qa_tokenizer, qa_model, top_k=5, retriever=retriever)
 
             if not top_answers:
                 st.warning("No relevant answers found.")
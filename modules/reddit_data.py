@@ -1,66 +1,316 @@
+import os
+import json
+import itertools
 import praw
+import prawcore
 import pandas as pd
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from modules import storage
+
+DATA_FILE = storage.CSV_FILE
+CHECKPOINT_FILE = "data/fetch_checkpoint.json"
+CSV_CHUNK_ROWS = 1000
+CSV_COLUMNS = storage.CSV_COLUMNS
+
+# Reddit allows 100 requests per minute for OAuth clients; stay a little under it.
+REQUESTS_PER_MINUTE = 90
+FETCH_WORKERS = 8
+
+# Point PRAW at another server (e.g. a local fake Reddit for tests) through the environment
+REDDIT_ENDPOINTS = {
+    key: os.environ[env]
+    for key, env in (("oauth_url", "REDDIT_OAUTH_URL"), ("reddit_url", "REDDIT_URL"))
+    if env in os.environ
+}
+
+REDDIT_CREDENTIALS = {
+    "client_id": "fGDuCosBvBG49tfpZYg2Kw",
+    "client_secret": "",
+    "user_agent": "windows:Reapes:v1.0 (by /u/Infamous-Version2359)",
+}
+
+class FetchDeadline(Exception):
+    pass
+
+class RateLimitedRequestor(prawcore.Requestor):
+    """PRAW requestor that takes one limiter token per HTTP request, whatever made it.
+
+    Search-listing pages, comment trees, `replace_more` expansions and token refreshes
+    are all charged. Raises FetchDeadline once waiting would pass `deadline`.
+    """
+
+    def __init__(self, *args, limiter=None, deadline=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.limiter = limiter
+        self.deadline = deadline
+
+    def request(self, *args, **kwargs):
+        if self.limiter is not None and not self.limiter.acquire(self.deadline):
+            raise FetchDeadline()
+        return super().request(*args, **kwargs)
+
+def new_reddit(limiter=None, deadline=None):
+    """A fresh PRAW instance; PRAW instances are not thread-safe, so each thread needs its own."""
+    return praw.Reddit(
+        **REDDIT_CREDENTIALS,
+        **REDDIT_ENDPOINTS,
+        requestor_class=RateLimitedRequestor,
+        requestor_kwargs={"limiter": limiter, "deadline": deadline},
+    )
+
+_thread_state = threading.local()
+
+def _init_fetch_thread(limiter, deadline):
+    _thread_state.reddit = new_reddit(limiter, deadline)
+
+class RateLimiter:
+    """Token bucket shared by the fetch workers: `rate` requests per `per` seconds."""
+
+    def __init__(self, rate=REQUESTS_PER_MINUTE, per=60.0):
+        self.capacity = rate
+        self.fill_rate = rate / per
+        self.tokens = float(rate)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline=None):
+        """Block until a request may be made. Returns False if that would pass `deadline`."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait_time = (1 - self.tokens) / self.fill_rate
+            if deadline is not None and now + wait_time > deadline:
+                return False
+            time.sleep(wait_time)
+
+def _fetch_post(post_id, max_comments):
+    # Runs on a fetch thread: everything goes through that thread's own PRAW instance
+    post = _thread_state.reddit.submission(id=post_id)
+    post.comments.replace_more(limit=0)
+    comments = [{
+        "comment_id": c.id,
+        "comment_body": c.body,
+        "comment_author": str(c.author),
+        "comment_score": c.score
+    } for c in post.comments.list()[:max_comments] if c.body]
+
+    return {
+        "post_id": post.id,
+        "subreddit": post.subreddit.display_name,
+        "post_title": post.title or "No Title",
+        "post_content": post.selftext or "No Content",
+        "post_author": str(post.author),
+        "post_score": post.score,
+        "post_url": post.url,
+        "post_created_utc": time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(post.created_utc)),
+        "comments": comments
+    }
+
+def iter_reddit_posts(keyword, post_limit=100, max_comments=50, max_runtime=300, max_workers=FETCH_WORKERS, skip_ids=(),
+                      limiter=None):
+    """Yield posts with their comments as they are downloaded, in search-result order.
+
+    Comment trees are fetched by a thread pool, each thread with its own PRAW
+    instance; every request, search pages included, is charged to one shared
+    `limiter` (default: REQUESTS_PER_MINUTE). At most `2 * max_workers` posts are in
+    flight or buffered, so memory stays bounded whatever `post_limit` is. Posts whose
+    id is in `skip_ids` are not fetched. The generator's return value (see
+    `fetch_to_store`) is whether every search result was fetched before the deadline.
+    """
+    deadline = time.monotonic() + max_runtime
+    limiter = limiter or RateLimiter()
+    search = iter(new_reddit(limiter, deadline).subreddit("all").search(keyword, limit=post_limit))
+    window = max_workers * 2
+
+    pending = {}
+    finished = {}
+    submitted = 0
+    next_rank = 0
+    exhausted = False
+    deadline_hit = False
+
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="reddit-fetch",
+                                  initializer=_init_fetch_thread, initargs=(limiter, deadline))
+    try:
+        while True:
+            while not exhausted and len(pending) + len(finished) < window and time.monotonic() <= deadline:
+                try:
+                    post = next(search)
+                except StopIteration:
+                    exhausted = True
+                    break
+                except FetchDeadline:
+                    exhausted = deadline_hit = True
+                    break
+                if post.id in skip_ids:
+                    continue
+                pending[executor.submit(_fetch_post, post.id, max_comments)] = submitted
+                submitted += 1
+
+            remaining = deadline - time.monotonic()
+            if not pending or remaining <= 0:
+                # Stopping with downloads in flight or search results unread: the deadline cut it short
+                deadline_hit = deadline_hit or bool(pending) or not exhausted
+                break
+
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                rank = pending.pop(future)
+                try:
+                    finished[rank] = future.result()
+                except FetchDeadline:
+                    deadline_hit = True
+                    finished[rank] = None
+                except Exception:
+                    finished[rank] = None
+
+            # Release posts only once everything ranked before them has arrived
+            while next_rank in finished:
+                post = finished.pop(next_rank)
+                next_rank += 1
+                if post is not None:
+                    yield post
+    finally:
+        # Drop queued downloads; in-flight ones finish in the background and are ignored
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    # Deadline hit with gaps in the sequence: keep what arrived, still in rank order
+    for rank in sorted(finished):
+        if finished[rank] is not None:
+            yield finished[rank]
+    return exhausted and not deadline_hit
+
+def fetch_reddit_data(keyword, post_limit=100, max_comments=50, max_runtime=300, max_workers=FETCH_WORKERS):
+    return list(iter_reddit_posts(keyword, post_limit, max_comments, max_runtime, max_workers))
+
+def _post_rows(post):
+    for comment in post["comments"]:
+        yield {
+            "subreddit": post["subreddit"],
+            "post_title": post["post_title"],
+            "post_content": post["post_content"],
+            "post_author": post["post_author"],
+            "post_score": post["post_score"],
+            "post_url": post["post_url"],
+            "post_created_utc": post["post_created_utc"],
+            "comment_body": comment["comment_body"],
+            "comment_author": comment["comment_author"],
+            "comment_score": comment["comment_score"],
+            "post_id": post.get("post_id"),
+            "comment_id": comment.get("comment_id")
+        }
+
+def _write_in_chunks(data, write_chunk, chunk_size, on_chunk):
+    # Buffer posts until they hold `chunk_size` comment rows, then hand them to `write_chunk`
+    written = 0
+    posts = []
+    rows = 0
+    first = True
+
+    def flush():
+        nonlocal written, rows, first
+        if rows:
+            write_chunk(posts, first)
+            first = False
+            written += rows
+            # Nothing reaches disk for a chunk without comment rows, so it isn't reported as done
+            if on_chunk is not None:
+                on_chunk([post.get("post_id") for post in posts])
+        posts.clear()
+        rows = 0
 
-reddit = praw.Reddit(
-    client_id="fGDuCosBvBG49tfpZYg2Kw",
-    client_secret="",
-    user_agent="windows:Reapes:v1.0 (by /u/Infamous-Version2359)"
-)
-
-DATA_FILE = "data/reddit_data.csv"
-
-def fetch_reddit_data(keyword, post_limit=100, max_comments=50, max_runtime=300):
-    data = []
-    start_time = time.time()
-
-    for post in reddit.subreddit("all").search(keyword, limit=post_limit):
-        if time.time() - start_time > max_runtime:
-            break  
-
-        try:
-            post.comments.replace_more(limit=0)
-            comments = [{
-                "comment_body": c.body,
-                "comment_author": str(c.author),
-                "comment_score": c.score
-            } for c in post.comments.list()[:max_comments] if c.body]
-
-            data.append({
-                "subreddit": post.subreddit.display_name,
-                "post_title": post.title or "No Title",
-                "post_content": post.selftext or "No Content",
-                "post_author": str(post.author),
-                "post_score": post.score,
-                "post_url": post.url,
-                "post_created_utc": time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(post.created_utc)),
-                "comments": comments
-            })
-
-        except:
-            continue
-
-    return data
-
-def save_data_to_csv(data):
-    if not data:
-        return
-
-    rows = []
     for post in data:
-        for comment in post["comments"]:
-            rows.append({
-                "subreddit": post["subreddit"],
-                "post_title": post["post_title"],
-                "post_content": post["post_content"],
-                "post_author": post["post_author"],
-                "post_score": post["post_score"],
-                "post_url": post["post_url"],
-                "post_created_utc": post["post_created_utc"],
-                "comment_body": comment["comment_body"],
-                "comment_author": comment["comment_author"],
-                "comment_score": comment["comment_score"]
-            })
-
-    if rows:
-        pd.DataFrame(rows).to_csv(DATA_FILE, index=False, encoding="utf-8")
+        posts.append(post)
+        rows += len(post["comments"])
+        if rows >= chunk_size:
+            flush()
+    flush()
+    return written
+
+def save_data_to_csv(data, path=DATA_FILE, append=False, chunk_size=CSV_CHUNK_ROWS, on_chunk=None):
+    """Write posts (any iterable, including a generator) to CSV in chunks of rows.
+
+    `on_chunk(post_ids)` is called after each chunk reaches disk with the ids of
+    the posts it completed. Returns the number of rows written.
+    """
+    header = not (append and os.path.exists(path))
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def write_chunk(posts, first):
+        # The existing file is only replaced once there is something to write
+        mode = "w" if first and not append else "a"
+        rows = [row for post in posts for row in _post_rows(post)]
+        pd.DataFrame(rows, columns=CSV_COLUMNS).to_csv(path, mode=mode, header=header and first, index=False, encoding="utf-8")
+
+    return _write_in_chunks(data, write_chunk, chunk_size, on_chunk)
+
+def save_data_to_store(data, store_dir=storage.STORE_DIR, append=False, chunk_size=CSV_CHUNK_ROWS, on_chunk=None):
+    """Write posts to the columnar store in chunks; each chunk becomes one part per table."""
+    def write_chunk(posts, first):
+        if first and not append:
+            storage.clear_store(store_dir)
+        storage.write_posts(posts, store_dir)
+
+    return _write_in_chunks(data, write_chunk, chunk_size, on_chunk)
+
+def _load_checkpoint(path=CHECKPOINT_FILE):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+def _write_checkpoint(checkpoint, path=CHECKPOINT_FILE):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".tmp", "w", encoding="utf-8") as file:
+        json.dump(checkpoint, file)
+    os.replace(path + ".tmp", path)
+
+def fetch_to_store(keyword, post_limit=100, max_comments=50, max_runtime=300, max_workers=FETCH_WORKERS,
+                   store_dir=storage.STORE_DIR, resume=True, chunk_size=CSV_CHUNK_ROWS, limiter=None):
+    """Stream a fetch straight into the columnar store, checkpointing the posts already on disk.
+
+    If a previous fetch for the same keyword was interrupted, its rows are kept and
+    only posts not yet written are fetched. Returns the number of rows written.
+    """
+    checkpoint = _load_checkpoint()
+    resuming = bool(
+        resume and checkpoint and not checkpoint.get("complete")
+        and checkpoint.get("keyword") == keyword and checkpoint.get("path") == store_dir
+        and storage.store_exists(store_dir)
+    )
+    if not resuming:
+        # Drop the previous data before the checkpoint names the new keyword, so a fetch that
+        # writes nothing can't be resumed on top of another keyword's store
+        storage.clear_store(store_dir)
+        checkpoint = {"keyword": keyword, "path": store_dir, "post_ids": [], "complete": False}
+        _write_checkpoint(checkpoint)
+
+    done_ids = set(checkpoint["post_ids"])
+    remaining_limit = max(post_limit - len(done_ids), 0)
+
+    def record(post_ids):
+        checkpoint["post_ids"].extend(post_ids)
+        _write_checkpoint(checkpoint)
+
+    complete = False
+
+    def fetch():
+        nonlocal complete
+        complete = yield from iter_reddit_posts(keyword, post_limit, max_comments, max_runtime, max_workers,
+                                                skip_ids=done_ids, limiter=limiter)
+
+    posts = itertools.islice(fetch(), remaining_limit)
+    written = save_data_to_store(posts, store_dir, append=True, chunk_size=chunk_size, on_chunk=record)
+
+    # A fetch cut short by the deadline stays resumable
+    if complete or len(checkpoint["post_ids"]) >= post_limit:
+        checkpoint["complete"] = True
+        _write_checkpoint(checkpoint)
+    return written
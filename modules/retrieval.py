@@ -0,0 +1,185 @@
+import time
+from abc import ABC, abstractmethod
+import numpy as np
+from modules.embedding_index import cosine_scores, _normalize
+
+def top_k_indices(scores, k):
+    """Indices of the `k` highest scores, best first, without sorting the whole array."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+class Retriever(ABC):
+    """Nearest-neighbour search over L2-normalised sentence embeddings.
+
+    Backends implement `build(embeddings)` and `search(query_vector, k)`, which
+    returns `(indices, scores)` ordered from most to least similar.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def build(self, embeddings):
+        """Index `embeddings` and return self."""
+
+    @abstractmethod
+    def search(self, query_vector, k):
+        """`(indices, scores)` of the `k` nearest embeddings."""
+
+class ExactRetriever(Retriever):
+    """Brute-force cosine similarity with a partial top-k selection."""
+
+    name = "exact"
+
+    def __init__(self):
+        self.embeddings = None
+
+    def build(self, embeddings):
+        self.embeddings = embeddings
+        return self
+
+    def search(self, query_vector, k):
+        if self.embeddings is None or len(self.embeddings) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = cosine_scores(self.embeddings, query_vector)
+        indices = top_k_indices(scores, k)
+        return indices, scores[indices]
+
+class IVFRetriever(Retriever):
+    """Inverted-file index: spherical k-means partitions, only `n_probe` of them scanned per query."""
+
+    name = "ivf"
+
+    def __init__(self, n_lists=None, n_probe=8, train_size=50000, iterations=10, seed=42):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.train_size = train_size
+        self.iterations = iterations
+        self.seed = seed
+        self.embeddings = None
+        self.centroids = None
+        self.list_rows = None
+        self.list_offsets = None
+
+    def _assign(self, vectors):
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), 65536):
+            block = np.asarray(vectors[start:start + 65536], dtype=np.float32)
+            assignments[start:start + len(block)] = np.argmax(block @ self.centroids.T, axis=1)
+        return assignments
+
+    def build(self, embeddings):
+        self.embeddings = embeddings
+        n = len(embeddings)
+        if n == 0:
+            return self
+
+        n_lists = self.n_lists or max(1, int(np.sqrt(n)))
+        n_lists = min(n_lists, n)
+        rng = np.random.default_rng(self.seed)
+        sample_rows = np.sort(rng.choice(n, size=min(self.train_size, n), replace=False))
+        sample = np.asarray(embeddings[sample_rows], dtype=np.float32)
+
+        self.centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(self.iterations):
+            labels = np.argmax(sample @ self.centroids.T, axis=1)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.bincount(labels, minlength=n_lists) == 0
+            # Re-seed empty partitions so every list stays useful
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            self.centroids = _normalize(sums)
+
+        assignments = self._assign(embeddings)
+        self.list_rows = np.argsort(assignments, kind="stable")
+        self.list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assignments, minlength=n_lists))))
+        return self
+
+    def search(self, query_vector, k):
+        if self.embeddings is None or len(self.embeddings) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        query = _normalize(query_vector).reshape(-1)
+        probes = top_k_indices(self.centroids @ query, self.n_probe)
+        rows = np.sort(np.concatenate([
+            self.list_rows[self.list_offsets[p]:self.list_offsets[p + 1]] for p in probes
+        ]))
+        scores = np.asarray(self.embeddings[rows], dtype=np.float32) @ query
+        best = top_k_indices(scores, k)
+        return rows[best], scores[best]
+
+class HNSWRetriever(Retriever):
+    """Graph-based search backed by the optional `hnswlib` package."""
+
+    name = "hnsw"
+
+    def __init__(self, ef_construction=200, m=16, ef_search=64):
+        self.ef_construction = ef_construction
+        self.m = m
+        self.ef_search = ef_search
+        self.index = None
+        self.size = 0
+
+    def build(self, embeddings):
+        try:
+            import hnswlib
+        except ImportError as e:
+            raise ImportError("The 'hnsw' retriever requires the optional 'hnswlib' package.") from e
+
+        self.size = len(embeddings)
+        if self.size == 0:
+            return self
+        self.index = hnswlib.Index(space="ip", dim=embeddings.shape[1])
+        self.index.init_index(max_elements=self.size, ef_construction=self.ef_construction, M=self.m)
+        for start in range(0, self.size, 65536):
+            block = np.asarray(embeddings[start:start + 65536], dtype=np.float32)
+            self.index.add_items(block, np.arange(start, start + len(block)))
+        self.index.set_ef(self.ef_search)
+        return self
+
+    def search(self, query_vector, k):
+        k = min(k, self.size)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        self.index.set_ef(max(self.ef_search, k))
+        labels, distances = self.index.knn_query(_normalize(query_vector).reshape(1, -1), k=k)
+        # hnswlib reports inner-product distance as 1 - similarity
+        return labels[0].astype(np.int64), (1.0 - distances[0]).astype(np.float32)
+
+RETRIEVERS = {
+    ExactRetriever.name: ExactRetriever,
+    IVFRetriever.name: IVFRetriever,
+    HNSWRetriever.name: HNSWRetriever,
+}
+
+def get_retriever(name, **kwargs):
+    if name not in RETRIEVERS:
+        raise ValueError(f"Unknown retriever '{name}'. Choose from: {', '.join(RETRIEVERS)}")
+    return RETRIEVERS[name](**kwargs)
+
+def evaluate_retriever(retriever, embeddings, queries, k=10):
+    """Recall@k of `retriever` against exact search, plus per-query latency percentiles."""
+    exact = ExactRetriever().build(embeddings)
+    recalls = []
+    latencies = []
+    for query in queries:
+        expected, _ = exact.search(query, k)
+        start = time.perf_counter()
+        found, _ = retriever.search(query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if len(expected):
+            recalls.append(len(set(expected.tolist()) & set(found.tolist())) / len(expected))
+
+    return {
+        "retriever": retriever.name,
+        "k": k,
+        "queries": len(latencies),
+        "recall": float(np.mean(recalls)) if recalls else 1.0,
+        "p50_ms": float(np.percentile(latencies, 50)) if latencies else 0.0,
+        "p95_ms": float(np.percentile(latencies, 95)) if latencies else 0.0,
+    }
@@ -1,38 +1,182 @@
 import os
+import json
+import time
+import logging
+import threading
 import pandas as pd
 import spacy
+import torch
 import streamlit as st
-from transformers import pipeline
+from modules import model_registry
+from transformers import pipeline, AutoTokenizer, AutoModelForSequenceClassification
 from collections import Counter
-from concurrent.futures import ThreadPoolExecutor
+from modules.batching import token_budget_batches
+from modules.sentiment_cache import SentimentCache, text_hash
+from modules.aspect_index import PhraseIndex
+from modules import storage, data_access, jobs, word_frequencies, sharded_inference, optimized_models
 
-SENTIMENT_FILE = "data/reddit_sentiment_analysis.csv"
-DATA_FILE = "data/reddit_data.csv"
+SENTIMENT_FILE = data_access.SENTIMENT_FILE
+SENTIMENT_META_FILE = data_access.SENTIMENT_META_FILE
+SENTIMENT_RESULTS_FILE = "data/sentiment_results.parquet"
+SENTIMENT_RESULT_COLUMNS = ["comment_id", "text_hash", "sentiment", "score"]
+SENTIMENT_CACHE_DB = "data/sentiment_cache.sqlite"
+ASPECT_RESULTS_FILE = "data/aspect_summaries.json"
+# Bundled DistilBERT fine-tuned on SST-2
+SENTIMENT_MODEL = model_registry.model_path("sentiment")
+# Identifies cached sentiment results; includes the inference mode when it isn't fp32
+SENTIMENT_MODEL_KEY = optimized_models.variant(SENTIMENT_MODEL)
+SENTIMENT_TOKEN_BUDGET = 8192
+SENTIMENT_MAX_LENGTH = 512
 
-@st.cache_resource
-def load_models():
-    return (
-        spacy.load("en_core_web_trf"),
-        pipeline("sentiment-analysis", model="distilbert-base-uncased-finetuned-sst-2-english")
-    )
+# spaCy pipelines for aspect extraction: "accurate" is the transformer model,
+# "fast" the small CNN model. Components the noun-chunk filter doesn't use are disabled.
+ASPECT_MODELS = {"accurate": "en_core_web_trf", "fast": "en_core_web_sm"}
+ASPECT_MODE = "accurate"
+ASPECT_DISABLED_PIPES = ["ner", "lemmatizer"]
+ASPECT_BATCH_SIZE = 64
+ASPECT_MAX_CHARS = 512
+MAX_ASPECTS = 5
+
+logger = logging.getLogger(__name__)
+
+def _load_aspect_model(mode):
+    try:
+        return spacy.load(ASPECT_MODELS[mode], disable=ASPECT_DISABLED_PIPES)
+    except OSError:
+        if mode == "fast":
+            raise
+        logger.warning("spaCy model %s is not installed, falling back to %s", ASPECT_MODELS[mode], ASPECT_MODELS["fast"])
+        return spacy.load(ASPECT_MODELS["fast"], disable=ASPECT_DISABLED_PIPES)
+
+# Nothing is loaded at import time; each handle loads on first use (or during warm-up)
+for _mode in ASPECT_MODELS:
+    model_registry.register(f"spacy:{_mode}", lambda mode=_mode: _load_aspect_model(mode), warm_up=_mode == ASPECT_MODE)
+
+def _load_sentiment_pipeline(model_path):
+    tokenizer = AutoTokenizer.from_pretrained(model_path, local_files_only=True)
+    model = model_registry.load_pretrained(AutoModelForSequenceClassification, model_path)
+    sentiment_pipeline = pipeline("sentiment-analysis", model=model, tokenizer=tokenizer)
+    # classify_texts only uses the tokenizer and model, so the model can be swapped for an optimized one
+    sentiment_pipeline.model = optimized_models.optimize(model, tokenizer, model_path, "sentiment")
+    return sentiment_pipeline
+
+model_registry.register("sentiment", model_registry.local_loader("sentiment", _load_sentiment_pipeline))
+model_registry.register(
+    "sentiment_cache",
+    lambda: SentimentCache(db_path=SENTIMENT_CACHE_DB, namespace=SENTIMENT_MODEL_KEY),
+    warm_up=False,
+)
+
+def load_aspect_model(mode=ASPECT_MODE):
+    return model_registry.get(f"spacy:{mode}")
+
+def load_sentiment_pipeline():
+    return model_registry.get("sentiment")
 
-nlp, sentiment_pipeline = load_models()
+def load_sentiment_cache():
+    return model_registry.get("sentiment_cache")
+
+def classify_texts(texts, tokenizer, model, max_tokens=SENTIMENT_TOKEN_BUDGET, max_length=SENTIMENT_MAX_LENGTH):
+    """Classify `texts` in length-sorted, token-budgeted batches. Returns (label, score) per text.
+
+    Works on any tokenizer/sequence-classification model pair, so it can be used
+    outside Streamlit.
+    """
+    start = time.perf_counter()
+    results = [None] * len(texts)
+
+    if texts:
+        # Truncate by tokens, not characters
+        encoded = tokenizer(list(texts), truncation=True, max_length=max_length)
+        input_names = [name for name in tokenizer.model_input_names if name in encoded]
+        lengths = [len(ids) for ids in encoded["input_ids"]]
+        id2label = model.config.id2label
+
+        for batch in token_budget_batches(lengths, max_tokens):
+            features = [{name: encoded[name][i] for name in input_names} for i in batch]
+            encoded_input = tokenizer.pad(features, return_tensors="pt")
+            with torch.no_grad():
+                probs = torch.softmax(model(**encoded_input).logits, dim=-1)
+            scores, label_ids = probs.max(dim=-1)
+            for i, label_id, score in zip(batch, label_ids.tolist(), scores.tolist()):
+                results[i] = (id2label[label_id], score)
+
+    elapsed = time.perf_counter() - start
+    rate = len(texts) / elapsed if elapsed > 0 else 0.0
+    logger.info("Classified %d comments in %.2fs (%.1f comments/sec)", len(texts), elapsed, rate)
+    return results
+
+def _classify_sharded(texts):
+    start = time.perf_counter()
+    results = sharded_inference.get_executor("sentiment").map(texts)
+    elapsed = time.perf_counter() - start
+    rate = len(texts) / elapsed if elapsed > 0 else 0.0
+    logger.info("Classified %d comments across %d workers in %.2fs (%.1f comments/sec)",
+                len(texts), sharded_inference.INFERENCE_WORKERS, elapsed, rate)
+    return results
+
+def analyze_sentiments(texts):
+    # Every sentiment call goes through the cache; only unseen texts reach the model
+    sentiment_cache = load_sentiment_cache()
+    cached = sentiment_cache.get_many(texts)
+    missing = list(dict.fromkeys(t for t in texts if t not in cached))
+    results = []
+    if missing:
+        if sharded_inference.should_shard(len(missing)):
+            results = _classify_sharded(missing)
+        else:
+            sentiment_pipeline = load_sentiment_pipeline()
+            results = classify_texts(missing, sentiment_pipeline.tokenizer, sentiment_pipeline.model)
+    sentiment_cache.put_many(zip(missing, results))
+    cached.update(zip(missing, results))
+    return [cached[t] for t in texts]
 
 def analyze_sentiment(text):
-    result = sentiment_pipeline(text[:512])[0]
-    return result["label"], result["score"]
+    return analyze_sentiments([text])[0]
 
-def extract_aspects(comment):
-    doc = nlp(comment[:512])
+def _doc_aspects(doc):
     aspects = []
     for chunk in doc.noun_chunks:
         if len(chunk.text.split()) > 1 and chunk.root.pos_ in ["NOUN", "PROPN"]:
             aspects.append(chunk.text.lower())
     return aspects
 
-def generate_aspect_summary(aspect, comments):
-    aspect_related_comments = [c for c in comments if aspect in c.lower()]
-    sentiments = [analyze_sentiment(c) for c in aspect_related_comments]
+def extract_aspects(comment):
+    return _doc_aspects(load_aspect_model()(comment[:ASPECT_MAX_CHARS]))
+
+def _default_n_process(model):
+    # Transformer pipelines already use every core through torch; extra processes
+    # would each load their own copy of the model. CNN pipelines scale with processes.
+    if "transformer" in model.pipe_names:
+        return 1
+    # spaCy forks its workers; forking from a worker thread (Streamlit, jobs, the
+    # pipeline) can deadlock on locks other threads held at the time
+    if threading.current_thread() is not threading.main_thread():
+        return 1
+    return max(1, min(4, (os.cpu_count() or 1) - 1))
+
+def extract_aspects_batch(comments, model=None, batch_size=ASPECT_BATCH_SIZE, n_process=None):
+    """Aspects for each comment via `nlp.pipe`, matching `extract_aspects` output."""
+    model = model or load_aspect_model()
+    n_process = n_process or _default_n_process(model)
+    start = time.perf_counter()
+
+    texts = (comment[:ASPECT_MAX_CHARS] for comment in comments)
+    results = [_doc_aspects(doc) for doc in model.pipe(texts, batch_size=batch_size, n_process=n_process)]
+
+    elapsed = time.perf_counter() - start
+    rate = len(results) / elapsed if elapsed > 0 else 0.0
+    model_name = f"{model.meta.get('lang', '')}_{model.meta.get('name', '')}"
+    logger.info("Extracted aspects from %d comments with %s (n_process=%d) at %.1f comments/sec",
+                len(results), model_name, n_process, rate)
+    return results
+
+def generate_aspect_summary(aspect, comments, index=None):
+    # An index over no comments is falsy, but still the one to use
+    if index is None:
+        index = PhraseIndex(comments)
+    aspect_related_comments = index.lookup(aspect)
+    sentiments = analyze_sentiments(aspect_related_comments)
 
     if not sentiments:
         return "No strong opinions."
@@ -48,48 +192,169 @@ def generate_aspect_summary(aspect, comments):
 
     return "\n\n".join(summary)  # 🔹 Clean structure with spacing
 
-def perform_aspect_sentiment_analysis(comments):
+def perform_aspect_sentiment_analysis(comments, max_aspects=MAX_ASPECTS):
     all_aspects = []
     aspect_summaries = {}
 
-    with ThreadPoolExecutor(max_workers=4) as executor:
-        results = executor.map(extract_aspects, comments)
-        all_aspects = [aspect for sublist in results for aspect in sublist]
+    results = extract_aspects_batch(comments)
+    all_aspects = [aspect for sublist in results for aspect in sublist]
+    # Built once per run; each aspect lookup is then a postings intersection
+    index = PhraseIndex(comments)
 
     aspect_counts = Counter(all_aspects)
-    top_aspects = [aspect for aspect, count in aspect_counts.most_common(5) if count > 2]
+    top_aspects = [aspect for aspect, count in aspect_counts.most_common(max_aspects) if count > 2]
 
     for aspect in top_aspects:
-        aspect_summaries[aspect.capitalize()] = generate_aspect_summary(aspect, comments)
+        aspect_summaries[aspect.capitalize()] = generate_aspect_summary(aspect, comments, index)
 
     return aspect_summaries
 
+def _load_sentiment_results():
+    if not os.path.exists(SENTIMENT_RESULTS_FILE):
+        return pd.DataFrame(columns=SENTIMENT_RESULT_COLUMNS)
+    return pd.read_parquet(SENTIMENT_RESULTS_FILE, columns=SENTIMENT_RESULT_COLUMNS)
+
+def _save_sentiment_results(results):
+    os.makedirs(os.path.dirname(SENTIMENT_RESULTS_FILE) or ".", exist_ok=True)
+    results.to_parquet(SENTIMENT_RESULTS_FILE + ".tmp", index=False)
+    os.replace(SENTIMENT_RESULTS_FILE + ".tmp", SENTIMENT_RESULTS_FILE)
+
+def compute_sentiment_results(df):
+    """Attach `sentiment` and `score` to `df`, classifying only comments without a stored result.
+
+    Results are stored per comment id and content hash (which includes the model
+    name), so an edited comment or a model change is classified again. The stored
+    table is pruned to the comments in `df`.
+    Returns the annotated frame and stats for the newly classified comments
+    (classified, seconds, comments_per_sec).
+    """
+    texts = df["comment_body"].astype(str)
+    keyed = df.assign(text_hash=[text_hash(text, SENTIMENT_MODEL_KEY) for text in texts])
+
+    stored = _load_sentiment_results().drop_duplicates(["comment_id", "text_hash"], keep="last")
+    merged = keyed.merge(stored, on=["comment_id", "text_hash"], how="left")
+
+    unseen = merged["sentiment"].isna().to_numpy()
+    classified = int(unseen.sum())
+    start = time.perf_counter()
+    if unseen.any():
+        results = analyze_sentiments(texts[unseen].tolist())
+        merged.loc[unseen, "sentiment"] = [label for label, _ in results]
+        merged.loc[unseen, "score"] = [score for _, score in results]
+    elapsed = time.perf_counter() - start
+
+    # Only the current dataset's comments are kept, so the file doesn't grow with every
+    # refresh; results for dropped comments stay in the SQLite cache
+    current_rows = merged[SENTIMENT_RESULT_COLUMNS].drop_duplicates(["comment_id", "text_hash"])
+    if unseen.any() or len(current_rows) != len(stored):
+        _save_sentiment_results(current_rows)
+
+    stats = {"classified": classified, "seconds": elapsed,
+             "comments_per_sec": classified / elapsed if classified and elapsed > 0 else 0.0}
+    return merged.drop(columns="text_hash"), stats
+
+def _precomputed_stats(df):
+    return {"classified": 0, "total": len(df), "seconds": 0.0, "comments_per_sec": 0.0, "precomputed": True}
+
+def compute_sentiment_dataset():
+    """Sentiment-annotated dataset for the current data, without any Streamlit output.
+
+    Reuses the sentiment file when it matches the current dataset and model; otherwise
+    classifies unseen comments and rewrites it. Returns the frame and its stats
+    (see `compute_sentiment_results`, plus total and precomputed), or (None, None)
+    when there is no data.
+    """
+    if not storage.dataset_exists():
+        return None, None
+
+    # Served only if it was computed from the dataset currently on disk
+    current = data_access.load_dataset("sentiment")
+    if current is not None and data_access.sentiment_meta().get("model") == SENTIMENT_MODEL_KEY:
+        return current, _precomputed_stats(current)
+
+    dataset_version = storage.dataset_version()
+    df = data_access.load_dataset("joined")
+
+    df, stats = compute_sentiment_results(df)
+    # The pages read these while jobs and pipeline stages write them; the meta goes last
+    storage.atomic_write(SENTIMENT_FILE, lambda path: df.to_csv(path, index=False))
+    storage.write_json(SENTIMENT_META_FILE, {"dataset_version": dataset_version, "model": SENTIMENT_MODEL_KEY})
+    word_frequencies.update_word_frequencies(df, SENTIMENT_MODEL_KEY, data_access.dataset_version("sentiment"))
+
+    stats.update(total=len(df), precomputed=False)
+    return df, stats
+
 def perform_sentiment_analysis():
-    if not os.path.exists(DATA_FILE):
+    if not storage.dataset_exists():
         st.error("⚠️ No data available. Please fetch Reddit data first.")
         return None
 
-    df = pd.read_csv(DATA_FILE)
-    if "comment_body" not in df.columns:
-        st.error("⚠️ The dataset must have a 'comment_body' column.")
-        return None
+    st.info("🔍 Performing sentiment analysis...")
+    df, stats = compute_sentiment_dataset()
+    _show_sentiment_stats(stats)
+    return df
 
-    if os.path.exists(SENTIMENT_FILE):
-        return pd.read_csv(SENTIMENT_FILE)
+def _show_sentiment_stats(stats):
+    if stats.get("precomputed"):
+        st.caption(f"📦 Loaded from precomputed results ({stats['total']} comments).")
+        return
+    cache_stats = load_sentiment_cache().stats()
+    st.caption(
+        f"Classified {stats['classified']} of {stats['total']} comments in {stats['seconds']:.1f}s ({stats['comments_per_sec']:.1f} comments/sec), "
+        f"cache hits: {cache_stats['hits']}, misses: {cache_stats['misses']}"
+    )
 
-    st.info("🔍 Performing sentiment analysis...")
+def load_aspect_results():
+    """Aspect summaries saved for the current sentiment file, or None if missing or stale."""
+    version = data_access.dataset_version("sentiment")
+    if version is None or not os.path.exists(ASPECT_RESULTS_FILE):
+        return None
+    with open(ASPECT_RESULTS_FILE, "r", encoding="utf-8") as file:
+        saved = json.load(file)
+    return saved["aspects"] if saved.get("sentiment_version") == version else None
 
-    df["sentiment"], df["score"] = zip(*df["comment_body"].astype(str).apply(analyze_sentiment))
-    df.to_csv(SENTIMENT_FILE, index=False)
-    return df
+def compute_aspect_results(df=None):
+    """Aspect summaries for the sentiment dataset, reusing the saved ones when still current."""
+    aspects = load_aspect_results()
+    if aspects is not None:
+        return aspects
+    if df is None:
+        df = data_access.load_dataset("sentiment")
+        if df is None:
+            return None
 
-def display_sentiment_analysis():
+    aspects = perform_aspect_sentiment_analysis(df["comment_body"].astype(str).tolist())
+    storage.write_json(ASPECT_RESULTS_FILE, {"sentiment_version": data_access.dataset_version("sentiment"), "aspects": aspects})
+    return aspects
 
-    df = perform_sentiment_analysis()
+def load_sentiment_results():
+    """Precomputed results for the current dataset in the shape `display_sentiment_analysis` takes."""
+    df = data_access.load_dataset("sentiment")
+    aspects = load_aspect_results()
+    if df is None or aspects is None or data_access.sentiment_meta().get("model") != SENTIMENT_MODEL_KEY:
+        return None
+    return {"df": df, "aspects": aspects, "stats": _precomputed_stats(df)}
 
+def _sentiment_job(job):
+    job.report_progress(0, 2)
+    df, stats = compute_sentiment_dataset()
     if df is None:
-        return
+        return None
+    job.report_progress(1, 2)
+    job.check_cancelled()
+    aspects = compute_aspect_results(df)
+    job.report_progress(2, 2)
+    return {"df": df, "aspects": aspects, "stats": stats}
 
+def start_background_sentiment_analysis():
+    """Queue sentiment and aspect analysis off the UI thread; deduplicated per dataset version."""
+    key = ("sentiment", storage.dataset_version() if storage.dataset_exists() else None)
+    return jobs.job_manager.submit("sentiment", _sentiment_job, key=key)
+
+def get_sentiment_job():
+    return jobs.job_manager.latest("sentiment")
+
+def render_sentiment_results(df, aspect_results):
     st.subheader("🔹 Most Upvoted Comments")
     upvoted_pos = df[df["sentiment"] == "POSITIVE"].nlargest(1, "comment_score")["comment_body"].values
     upvoted_neg = df[df["sentiment"] == "NEGATIVE"].nlargest(1, "comment_score")["comment_body"].values
@@ -97,7 +362,19 @@ def display_sentiment_analysis():
     st.write(f"**Negative:** {upvoted_neg[0] if upvoted_neg else 'No negative comments found'}")
 
     st.subheader("🔹 Aspect-Based Sentiment Analysis")
-    aspect_results = perform_aspect_sentiment_analysis(df["comment_body"].astype(str).tolist())
-
     for aspect, summary in aspect_results.items():
         st.markdown(f"**{aspect.capitalize()}**\n\n{summary}\n", unsafe_allow_html=True)  # 🔹 Structured Output
+
+def display_sentiment_analysis(results=None):
+    """Render sentiment results, computing them in the foreground if no job result is given."""
+    if results is not None:
+        _show_sentiment_stats(results["stats"])
+        render_sentiment_results(results["df"], results["aspects"])
+        return
+
+    df = perform_sentiment_analysis()
+
+    if df is None:
+        return
+
+    render_sentiment_results(df, perform_aspect_sentiment_analysis(df["comment_body"].astype(str).tolist()))
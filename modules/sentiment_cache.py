@@ -0,0 +1,103 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+def text_hash(text, namespace=""):
+    return hashlib.sha1(f"{namespace}\0{text}".encode("utf-8")).hexdigest()
+
+class SentimentCache:
+    """Content-hash keyed (label, score) cache: in-memory LRU, optionally backed by SQLite.
+
+    `namespace` (typically the model name) is folded into every key, so results
+    from different models never collide in a shared database.
+    """
+
+    def __init__(self, max_entries=100000, db_path=None, namespace=""):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.namespace = namespace
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        if db_path:
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sentiment (hash TEXT PRIMARY KEY, label TEXT NOT NULL, score REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def key(self, text):
+        return text_hash(text, self.namespace)
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, texts):
+        """Return {text: (label, score)} for every text already classified."""
+        keys = {text: self.key(text) for text in texts}
+        found = {}
+        with self._lock:
+            pending = {}
+            for text, key in keys.items():
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[text] = self._memory[key]
+                else:
+                    pending[key] = text
+
+            if pending and self._db is not None:
+                pending_keys = list(pending)
+                for start in range(0, len(pending_keys), 500):
+                    chunk = pending_keys[start:start + 500]
+                    rows = self._db.execute(
+                        f"SELECT hash, label, score FROM sentiment WHERE hash IN ({','.join('?' * len(chunk))})",
+                        chunk,
+                    ).fetchall()
+                    for key, label, score in rows:
+                        found[pending[key]] = (label, score)
+                        self._remember(key, (label, score))
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, text):
+        return self.get_many([text]).get(text)
+
+    def put_many(self, items):
+        """Store an iterable of (text, (label, score)) pairs."""
+        rows = [(self.key(text), label, float(score)) for text, (label, score) in items]
+        with self._lock:
+            for key, label, score in rows:
+                self._remember(key, (label, score))
+            if rows and self._db is not None:
+                self._db.executemany("INSERT OR REPLACE INTO sentiment VALUES (?, ?, ?)", rows)
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self.hits = 0
+            self.misses = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM sentiment")
+                self._db.commit()
@@ -0,0 +1,139 @@
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from modules import model_registry
+
+logger = logging.getLogger(__name__)
+
+# Worker processes used for large sentiment and embedding jobs; 1 keeps inference in-process
+INFERENCE_WORKERS = 1
+# Jobs smaller than this are not worth the inter-process round trips
+SHARD_MIN_TEXTS = 2000
+SHARD_CHUNK_SIZE = 256
+
+_worker_fn = None
+# Every pool is sized for all cores, so two sharded jobs at once (the pipeline runs its
+# sentiment and embeddings stages concurrently) would oversubscribe the CPU; they take turns
+_compute_lock = threading.Lock()
+
+def _sentiment_task():
+    from modules import sentiment_analysis
+    sentiment_pipeline = sentiment_analysis.load_sentiment_pipeline()
+    return lambda texts: sentiment_analysis.classify_texts(texts, sentiment_pipeline.tokenizer, sentiment_pipeline.model)
+
+def _embedding_task():
+    from modules import qa_bot
+    tokenizer, model = qa_bot.load_embedding_model()
+    return lambda texts: list(qa_bot.compute_embeddings(texts, tokenizer, model).numpy())
+
+# Each task builds, once per worker process, a function from a list of texts to one result per text
+TASKS = {"sentiment": _sentiment_task, "embedding": _embedding_task}
+
+def _init_worker(task, threads):
+    global _worker_fn
+    import torch
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    # The parent verified the model files before starting the pool
+    model_registry.VERIFY_CHECKSUMS = False
+    _worker_fn = TASKS[task]()
+
+def _run_chunk(texts):
+    return _worker_fn(texts)
+
+def _ready(_):
+    return os.getpid()
+
+def default_threads(num_workers):
+    return max(1, (os.cpu_count() or 1) // num_workers)
+
+class ShardedInference:
+    """A pool of worker processes, each holding its own copy of one task's model.
+
+    Texts are split into fixed-size chunks and sent to the workers; results come
+    back per text, in input order, as soon as the preceding chunks are done.
+    """
+
+    def __init__(self, task, num_workers, threads_per_worker=None, chunk_size=SHARD_CHUNK_SIZE):
+        self.task = task
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker or default_threads(num_workers)
+        self.chunk_size = chunk_size
+        # Hash the weights once here rather than once per worker
+        model_registry.verify_model(task)
+        # Forking after torch has started its thread pools can deadlock, so workers are spawned
+        context = multiprocessing.get_context("spawn")
+        self._pool = context.Pool(num_workers, initializer=_init_worker, initargs=(task, self.threads_per_worker))
+
+    def wait_ready(self):
+        """Block until the pool has answered one call per worker; returns the seconds waited."""
+        start = time.perf_counter()
+        self._pool.map(_ready, range(self.num_workers), chunksize=1)
+        return time.perf_counter() - start
+
+    def imap(self, texts):
+        """Results per text, in order. Holds the CPU for all pools until exhausted or closed."""
+        texts = list(texts)
+        chunks = (texts[i:i + self.chunk_size] for i in range(0, len(texts), self.chunk_size))
+        with _compute_lock:
+            for results in self._pool.imap(_run_chunk, chunks):
+                yield from results
+
+    def map(self, texts):
+        return list(self.imap(texts))
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+_executors = {}
+_lock = threading.Lock()
+
+def get_executor(task, num_workers=None, threads_per_worker=None):
+    """Shared executor for `task`, started on first use and kept so models load once per worker."""
+    num_workers = num_workers or INFERENCE_WORKERS
+    key = (task, num_workers, threads_per_worker)
+    with _lock:
+        if key not in _executors:
+            _executors[key] = ShardedInference(task, num_workers, threads_per_worker)
+        return _executors[key]
+
+def should_shard(num_texts):
+    return INFERENCE_WORKERS > 1 and num_texts >= SHARD_MIN_TEXTS
+
+def shutdown():
+    with _lock:
+        for executor in _executors.values():
+            executor.close()
+        _executors.clear()
+
+def scaling_curve(task, texts, worker_counts=(1, 2, 4, 8), threads_per_worker=None):
+    """Throughput of `task` over `texts` for each worker count, for the benchmark output.
+
+    Start-up (spawning workers and loading one model each) is reported separately
+    from the inference time.
+    """
+    curve = []
+    for num_workers in worker_counts:
+        start = time.perf_counter()
+        executor = ShardedInference(task, num_workers, threads_per_worker)
+        try:
+            executor.wait_ready()
+            startup = time.perf_counter() - start
+            start = time.perf_counter()
+            executor.map(texts)
+            elapsed = time.perf_counter() - start
+        finally:
+            executor.close()
+        rate = len(texts) / elapsed if elapsed > 0 else 0.0
+        logger.info("%s with %d workers x %d threads: %.1f texts/sec", task, num_workers, executor.threads_per_worker, rate)
+        curve.append({
+            "workers": num_workers,
+            "threads_per_worker": executor.threads_per_worker,
+            "startup_seconds": startup,
+            "seconds": elapsed,
+            "texts_per_sec": rate,
+        })
+    return curve
@@ -0,0 +1,188 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+STORE_DIR = "data/store"
+CSV_FILE = "data/reddit_data.csv"
+
+POSTS_SCHEMA = pa.schema([
+    ("post_id", pa.string()),
+    ("subreddit", pa.string()),
+    ("post_title", pa.string()),
+    ("post_content", pa.string()),
+    ("post_author", pa.string()),
+    ("post_score", pa.int64()),
+    ("post_url", pa.string()),
+    ("post_created_utc", pa.string()),
+])
+COMMENTS_SCHEMA = pa.schema([
+    ("comment_id", pa.string()),
+    ("post_id", pa.string()),
+    ("comment_body", pa.string()),
+    ("comment_author", pa.string()),
+    ("comment_score", pa.int64()),
+])
+SCHEMAS = {"posts": POSTS_SCHEMA, "comments": COMMENTS_SCHEMA}
+
+# Column order of the denormalised reddit_data.csv view
+CSV_COLUMNS = [
+    "subreddit", "post_title", "post_content", "post_author", "post_score", "post_url",
+    "post_created_utc", "comment_body", "comment_author", "comment_score", "post_id", "comment_id"
+]
+
+# Low-cardinality strings come back as pandas categoricals instead of one object per row
+DICTIONARY_COLUMNS = ["subreddit", "post_author", "comment_author"]
+
+def atomic_write(path, write):
+    """Create `path` by calling `write(tmp_path)`, then rename it into place in one step.
+
+    Readers see either the old file or the complete new one. The temp name is unique
+    per call, so concurrent writers never share a partial file.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def write_text(path, text):
+    def write(tmp_path):
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(text)
+    atomic_write(path, write)
+
+def write_json(path, data):
+    write_text(path, json.dumps(data))
+
+def _table_dir(table, store_dir=STORE_DIR):
+    return os.path.join(store_dir, table)
+
+def _part_files(table, store_dir=STORE_DIR):
+    return sorted(glob.glob(os.path.join(_table_dir(table, store_dir), "part-*.parquet")))
+
+def _synthetic_id(*parts):
+    return hashlib.sha1("\0".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:16]
+
+def _write_part(table, rows, store_dir=STORE_DIR):
+    if not rows:
+        return
+    directory = _table_dir(table, store_dir)
+    os.makedirs(directory, exist_ok=True)
+    # Time-ordered names keep parts in write order; the rename makes each part appear atomically
+    name = f"part-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}.parquet"
+    tmp_path = os.path.join(directory, name + ".tmp")
+    pq.write_table(pa.Table.from_pylist(rows, schema=SCHEMAS[table]), tmp_path, use_dictionary=True)
+    os.replace(tmp_path, os.path.join(directory, name))
+
+def store_exists(store_dir=STORE_DIR):
+    return bool(_part_files("comments", store_dir))
+
+def dataset_exists(store_dir=STORE_DIR, csv_path=CSV_FILE):
+    return store_exists(store_dir) or os.path.exists(csv_path)
+
+def clear_store(store_dir=STORE_DIR):
+    if os.path.isdir(store_dir):
+        shutil.rmtree(store_dir)
+
+def write_posts(posts, store_dir=STORE_DIR):
+    """Append fetched posts (dicts with a nested "comments" list) as one part per table."""
+    post_rows = []
+    comment_rows = []
+    for post in posts:
+        post_id = post.get("post_id") or _synthetic_id(post["post_url"], post["post_title"], post["post_created_utc"])
+        post_rows.append({name: (post_id if name == "post_id" else post.get(name)) for name in POSTS_SCHEMA.names})
+        for position, comment in enumerate(post["comments"]):
+            comment_rows.append({
+                "comment_id": comment.get("comment_id") or _synthetic_id(post_id, position, comment["comment_body"]),
+                "post_id": post_id,
+                "comment_body": comment["comment_body"],
+                "comment_author": comment.get("comment_author"),
+                "comment_score": comment.get("comment_score"),
+            })
+    _write_part("posts", post_rows, store_dir)
+    _write_part("comments", comment_rows, store_dir)
+    return len(post_rows), len(comment_rows)
+
+def import_csv(csv_path=CSV_FILE, store_dir=STORE_DIR):
+    """Replace the store with the contents of a denormalised reddit_data.csv."""
+    df = pd.read_csv(csv_path)
+    if "post_id" not in df.columns:
+        df["post_id"] = [
+            _synthetic_id(url, title, created)
+            for url, title, created in zip(df.get("post_url", ""), df.get("post_title", ""), df.get("post_created_utc", ""))
+        ]
+    if "comment_id" not in df.columns:
+        df["comment_id"] = [_synthetic_id(pid, row, body) for row, (pid, body) in enumerate(zip(df["post_id"], df["comment_body"]))]
+
+    for schema in (POSTS_SCHEMA, COMMENTS_SCHEMA):
+        for field in schema:
+            if field.name not in df.columns:
+                df[field.name] = None
+
+    for column in ("post_score", "comment_score"):
+        df[column] = pd.to_numeric(df[column], errors="coerce").astype("Int64")
+    df = df.astype(object).where(df.notna(), None)
+    posts = df[POSTS_SCHEMA.names].drop_duplicates("post_id")
+    comments = df[COMMENTS_SCHEMA.names]
+
+    clear_store(store_dir)
+    _write_part("posts", posts.to_dict("records"), store_dir)
+    _write_part("comments", comments.to_dict("records"), store_dir)
+
+def ensure_store(store_dir=STORE_DIR, csv_path=CSV_FILE):
+    # Datasets saved before the columnar store existed are imported on first read
+    if not store_exists(store_dir) and os.path.exists(csv_path):
+        import_csv(csv_path, store_dir)
+
+def _read(table, columns=None, store_dir=STORE_DIR):
+    ensure_store(store_dir)
+    schema = SCHEMAS[table]
+    columns = list(columns) if columns is not None else schema.names
+    files = _part_files(table, store_dir)
+    if not files:
+        return pd.DataFrame(columns=columns)
+    dictionary = [c for c in DICTIONARY_COLUMNS if c in columns and c in schema.names]
+    dataset = pq.ParquetDataset(files, read_dictionary=dictionary or None)
+    return dataset.read(columns=columns).to_pandas()
+
+def read_posts(columns=None, store_dir=STORE_DIR):
+    return _read("posts", columns, store_dir)
+
+def read_comments(columns=None, store_dir=STORE_DIR):
+    return _read("comments", columns, store_dir)
+
+def read_joined(columns=None, store_dir=STORE_DIR):
+    """Comments with the requested post fields attached: the old reddit_data.csv rows, projected."""
+    columns = list(columns) if columns is not None else CSV_COLUMNS
+    comment_columns = [c for c in COMMENTS_SCHEMA.names if c in columns or c == "post_id"]
+    post_columns = [c for c in POSTS_SCHEMA.names if c in columns and c != "post_id"]
+
+    df = read_comments(comment_columns, store_dir)
+    if post_columns:
+        posts = read_posts(["post_id"] + post_columns, store_dir)
+        df = df.merge(posts, on="post_id", how="left")
+    return df[columns]
+
+def export_csv(csv_path=CSV_FILE, store_dir=STORE_DIR):
+    os.makedirs(os.path.dirname(csv_path) or ".", exist_ok=True)
+    read_joined(store_dir=store_dir).to_csv(csv_path, index=False, encoding="utf-8")
+
+def dataset_version(store_dir=STORE_DIR):
+    """Fingerprint of the files currently in the store; changes whenever data is written."""
+    ensure_store(store_dir)
+    digest = hashlib.sha1()
+    for table in SCHEMAS:
+        for path in _part_files(table, store_dir):
+            stat = os.stat(path)
+            digest.update(f"{path}:{stat.st_mtime_ns}:{stat.st_size}".encode("utf-8"))
+    return digest.hexdigest()
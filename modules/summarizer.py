@@ -1,34 +1,226 @@
 import os
-import pandas as pd
-import re
-import threading
-import torch
+import json
+import math
+import time
+import logging
 import numpy as np
-from transformers import pipeline
+import torch
+from modules import model_registry
+from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+from modules import storage, data_access, jobs, qa_bot, text_normalize
+from modules.embedding_index import EmbeddingIndex
 
-DATA_FILE = "data/reddit_data.csv"
 SUMMARY_FILE = "data/summarized_reddit_data.txt"
-SUMMARIZER_MODEL = "facebook/bart-large-cnn"
+SUMMARY_META_FILE = "data/summarized_reddit_data.json"
+# Saved by setup_project.py; never downloaded at run time
+SUMMARIZER_MODEL = model_registry.model_path("summarizer")
+SUMMARIZER_BATCH_SIZE = 8
+
+# "truncate" summarizes the top comments, one truncated input per cluster;
+# "hierarchical" reads every comment with map-reduce over token-sized chunks.
+SUMMARY_MODE = "truncate"
+MAX_GENERATE_CALLS = 64
+
+# Clustering features: "tfidf" or "embedding" (the MiniLM encoder used by the Q/A bot)
+CLUSTER_BACKEND = "tfidf"
+MINIBATCH_THRESHOLD = 10000
+
+logger = logging.getLogger(__name__)
+
+class SummarizerEngine:
+    """Seq2seq summarizer loaded once and run on padded batches of texts."""
+
+    def __init__(self, model_name=SUMMARIZER_MODEL, batch_size=SUMMARIZER_BATCH_SIZE):
+        if not os.path.isdir(model_name):
+            raise model_registry.ModelIntegrityError(
+                f"Summarizer model not found at {model_name}. Run setup_project.py to export it."
+            )
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, local_files_only=True)
+        self.model = model_registry.load_pretrained(AutoModelForSeq2SeqLM, model_name)
+
+    @property
+    def max_input_tokens(self):
+        return min(self.tokenizer.model_max_length, self.model.config.max_position_embeddings)
+
+    def count_tokens(self, texts):
+        return [len(ids) for ids in self.tokenizer(list(texts), add_special_tokens=False)["input_ids"]]
+
+    def generate_calls(self, n_texts):
+        return math.ceil(n_texts / self.batch_size)
+
+    def summarize(self, texts, max_input_length=None, max_summary_length=150, min_summary_length=50, progress=None):
+        """Summaries for `texts`, each input truncated to `max_input_length` tokens.
+
+        `progress(done, total)` is called after every batch.
+        """
+        max_input_length = min(max_input_length or self.max_input_tokens, self.max_input_tokens)
+        summaries = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = texts[start:start + self.batch_size]
+            encoded = self.tokenizer(batch, padding=True, truncation=True, max_length=max_input_length, return_tensors="pt")
+            with torch.no_grad():
+                output = self.model.generate(
+                    **encoded,
+                    max_length=max_summary_length,
+                    min_length=min_summary_length,
+                    do_sample=False,
+                )
+            summaries.extend(self.tokenizer.batch_decode(output, skip_special_tokens=True))
+            if progress is not None:
+                progress(len(summaries), len(texts))
+        return [summary.strip() for summary in summaries]
+
+model_registry.register("summarizer", model_registry.local_loader("summarizer", SummarizerEngine))
+
+def load_summarizer():
+    return model_registry.get("summarizer")
+
+def pack_chunks(texts, lengths, max_tokens):
+    """Greedily join consecutive texts into chunks of at most `max_tokens` tokens."""
+    chunks = []
+    current, current_tokens = [], 0
+    for text, length in zip(texts, lengths):
+        if current and current_tokens + length > max_tokens:
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += length
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+def hierarchical_summarize(clusters, engine, max_input_length=1024, max_summary_length=150, min_summary_length=50,
+                           max_generate_calls=MAX_GENERATE_CALLS, progress=None):
+    """Map-reduce summarization: one summary per cluster, reading the whole cluster.
+
+    Map: each cluster is packed into chunks of `max_input_length` tokens and all chunks
+    are summarized in batches. Reduce: a cluster's partial summaries are packed and
+    summarized again until one remains. Generate calls stay within `max_generate_calls`,
+    except that every cluster always gets at least one: when a round no longer fits the
+    budget, each unfinished cluster's top chunk is summarized on its own instead.
+    When the map step alone would exceed the budget, the lowest-ranked chunks of each
+    cluster are dropped proportionally (clusters should be ordered best comment first).
+    `progress(done, total)` reports finished clusters after every batch.
+    """
+    max_tokens = min(max_input_length, engine.max_input_tokens)
+    if max_summary_length >= max_tokens:
+        # Partial summaries would not fit back into the model, so the reduce step could never finish
+        raise ValueError(f"max_summary_length ({max_summary_length}) must be below the input limit ({max_tokens} tokens).")
+    levels = [pack_chunks(cluster, engine.count_tokens(cluster), max_tokens) for cluster in clusters if cluster]
+    if not levels:
+        return []
+
+    # Leave room for about two reduce rounds over all clusters
+    reserve = 2 * engine.generate_calls(len(levels))
+    map_capacity = max(len(levels), (max_generate_calls - reserve) * engine.batch_size)
+    total_chunks = sum(len(chunks) for chunks in levels)
+    if total_chunks > map_capacity:
+        levels = [chunks[:max(1, int(map_capacity * len(chunks) / total_chunks))] for chunks in levels]
+        logger.warning("Generate budget allows %d of %d chunks; dropped the lowest-ranked %d",
+                       sum(len(c) for c in levels), total_chunks, total_chunks - sum(len(c) for c in levels))
+
+    calls = 0
+    final = [None] * len(levels)
+
+    def on_batch(done, total):
+        if progress is not None:
+            progress(sum(summary is not None for summary in final), len(final))
+    pending = {i: chunks for i, chunks in enumerate(levels)}
+    while pending:
+        flat = [(i, chunk) for i, chunks in pending.items() for chunk in chunks]
+        if calls + engine.generate_calls(len(flat)) > max_generate_calls:
+            # Out of budget: one last truncated pass over each cluster's top chunk
+            top = list(pending.items())
+            summaries = engine.summarize([chunks[0] for _, chunks in top], max_tokens, max_summary_length,
+                                         min_summary_length, on_batch)
+            calls += engine.generate_calls(len(top))
+            for (i, _), summary in zip(top, summaries):
+                final[i] = summary
+            break
 
-summarization_status = {"is_processing": False, "result": None, "error": None}
+        summaries = engine.summarize([chunk for _, chunk in flat], max_tokens, max_summary_length, min_summary_length, on_batch)
+        calls += engine.generate_calls(len(flat))
+
+        grouped = {}
+        for (i, _), summary in zip(flat, summaries):
+            grouped.setdefault(i, []).append(summary)
+
+        pending = {}
+        for i, partials in grouped.items():
+            if len(partials) == 1:
+                final[i] = partials[0]
+            else:
+                pending[i] = pack_chunks(partials, engine.count_tokens(partials), max_tokens)
+        on_batch(0, 0)
+
+    logger.info("Hierarchical summarization used %d generate calls for %d chunks", calls, sum(len(c) for c in levels))
+    return final
 
 def clean_text(text):
-    text = re.sub(r'http\S+', '', text)  
-    text = re.sub(r'\d+', '', text)  
-    text = re.sub(r'[^\w\s]', '', text)  
-    return text.strip()
+    return text_normalize.clean_for_summary(text)
+
+def _tfidf_features(comments, raw_comments):
+    return TfidfVectorizer(stop_words="english").fit_transform(comments)
+
+def _embedding_features(comments, raw_comments):
+    # Raw comment text is what the Q/A index stores, so most vectors come from its cache
+    tokenizer, model = qa_bot.load_embedding_model()
+    index = EmbeddingIndex(signature=qa_bot.EMBEDDING_SIGNATURE)
+    return index.vectors_for(raw_comments or comments, lambda batch: qa_bot.embed_texts(batch, tokenizer, model))
+
+CLUSTER_FEATURES = {"tfidf": _tfidf_features, "embedding": _embedding_features}
+
+def choose_num_clusters(X, max_clusters=10, sample_size=2000, random_state=42):
+    """Cluster count in [2, max_clusters] with the best silhouette score on a sample."""
+    n = X.shape[0]
+    if n < 3:
+        return 1
+    rng = np.random.default_rng(random_state)
+    sample = X[np.sort(rng.choice(n, size=min(sample_size, n), replace=False))]
+
+    best_k, best_score = 2, -1.0
+    for k in range(2, min(max_clusters, sample.shape[0] - 1) + 1):
+        labels = MiniBatchKMeans(n_clusters=k, random_state=random_state, n_init=3).fit_predict(sample)
+        if len(set(labels)) < 2:
+            continue
+        score = silhouette_score(sample, labels)
+        if score > best_score:
+            best_k, best_score = k, score
+    return best_k
+
+def cluster_comments(comments, num_clusters=5, backend=CLUSTER_BACKEND, raw_comments=None):
+    """Group comments into clusters using TF-IDF or MiniLM sentence-embedding features.
 
-def cluster_comments(comments, num_clusters=5):
-    vectorizer = TfidfVectorizer(stop_words="english")
-    X = vectorizer.fit_transform(comments)
+    `num_clusters="auto"` picks the count by silhouette score. With the embedding
+    backend, `raw_comments` (same order as `comments`) are embedded instead of the
+    cleaned text. Backend, cluster count and seconds are logged; memory is left to
+    the benchmark harness, which traces it in a separate run.
+    """
+    start = time.perf_counter()
+    try:
+        X = CLUSTER_FEATURES[backend](comments, raw_comments)
 
-    num_clusters = min(num_clusters, len(comments))  
-    if num_clusters < 2:
-        return [comments]  
-    kmeans = KMeans(n_clusters=num_clusters, random_state=42, n_init=10)
-    clusters = kmeans.fit_predict(X)
+        if num_clusters == "auto":
+            num_clusters = choose_num_clusters(X)
+        num_clusters = min(num_clusters, len(comments))
+        if num_clusters < 2:
+            return [comments]
+
+        if backend == "tfidf" and len(comments) <= MINIBATCH_THRESHOLD:
+            kmeans = KMeans(n_clusters=num_clusters, random_state=42, n_init=10)
+        else:
+            # Mini-batches keep the cost roughly linear for large comment sets
+            kmeans = MiniBatchKMeans(n_clusters=num_clusters, random_state=42, n_init=3, batch_size=1024)
+        clusters = kmeans.fit_predict(X)
+    finally:
+        elapsed = time.perf_counter() - start
+        logger.info("Clustered %d comments into %s clusters with %s features in %.2fs",
+                    len(comments), num_clusters, backend, elapsed)
 
     clustered_comments = {i: [] for i in range(num_clusters)}
     for comment, cluster in zip(comments, clusters):
@@ -36,57 +228,97 @@ def cluster_comments(comments, num_clusters=5):
 
     return list(clustered_comments.values())
 
-def start_background_summarization():
-    def summarize_data():
-        global summarization_status
-        summarization_status["is_processing"] = True
-        summarization_status["error"] = None
-        summarization_status["result"] = None
-        
-        try:
-            summarized_text = summarize_content()
-            summarization_status["result"] = summarized_text
-        except Exception as e:
-            summarization_status["error"] = str(e)
-        finally:
-            summarization_status["is_processing"] = False
-
-    thread = threading.Thread(target=summarize_data)
-    thread.start()
+def load_summary():
+    """The saved summary if it was produced from the dataset currently on disk, else None."""
+    if not storage.dataset_exists() or not os.path.exists(SUMMARY_FILE) or not os.path.exists(SUMMARY_META_FILE):
+        return None
+    with open(SUMMARY_META_FILE, "r", encoding="utf-8") as file:
+        if json.load(file).get("dataset_version") != storage.dataset_version():
+            return None
+    with open(SUMMARY_FILE, "r", encoding="utf-8") as file:
+        return file.read()
+
+def _summarization_job(job, **kwargs):
+    def progress(done, total):
+        job.report_progress(done, total)
+        job.check_cancelled()
+
+    return summarize_content(progress=progress, **kwargs)
+
+def start_background_summarization(**kwargs):
+    """Queue a summarization job; a second request for the same dataset and settings reuses the running job."""
+    key = ("summarization", storage.dataset_version() if storage.dataset_exists() else None, tuple(sorted(kwargs.items())))
+    previous = get_summarization_job()
+    if previous is not None and previous.in_flight and previous.key != key:
+        # The data or settings changed under the running job; its summary would not be the one asked for
+        previous.cancel()
+    return jobs.job_manager.submit("summarization", _summarization_job, key=key, **kwargs)
+
+def get_summarization_job():
+    return jobs.job_manager.latest("summarization")
 
 def get_summarization_status():
-    return summarization_status["is_processing"], summarization_status["result"], summarization_status["error"]
+    job = get_summarization_job()
+    if job is None:
+        return False, None, None
+    return job.in_flight, job.result, job.error
 
-def summarize_content(max_input_length=1024, max_summary_length=150, min_summary_length=50, num_clusters=5):
-    if not os.path.exists(DATA_FILE):
-        return "⚠️ No data available. Please fetch Reddit data first."
+def summarize_content(max_input_length=1024, max_summary_length=150, min_summary_length=50, num_clusters=5, timings=None,
+                      mode=SUMMARY_MODE, max_generate_calls=MAX_GENERATE_CALLS, progress=None, cluster_backend=CLUSTER_BACKEND):
+    """Cluster comments and summarize every cluster in batched generate calls.
+
+    `max_input_length` is in tokens. In "truncate" mode only the top 100 comments are
+    used and each cluster is cut to one input; "hierarchical" mode reads every comment
+    (see `hierarchical_summarize`). If `timings` is a dict it receives seconds per stage;
+    `progress(clusters_done, clusters_total)` is called as clusters are summarized.
+    """
+    stage_times = timings if timings is not None else {}
+    start = time.perf_counter()
 
-    data = pd.read_csv(DATA_FILE, encoding="utf-8")
-    if "comment_body" not in data.columns:
-        return "⚠️ The dataset must have a 'comment_body' column."
+    if not storage.dataset_exists():
+        return "⚠️ No data available. Please fetch Reddit data first."
 
-    data = data.nlargest(100, 'comment_score') if 'comment_score' in data.columns else data
-    comments = data["comment_body"].dropna().astype(str).tolist()
+    dataset_version = storage.dataset_version()
+    data = data_access.load_dataset("comments", ["comment_body", "comment_score"])
+    if mode == "hierarchical":
+        # Best comments first, so a tight generate budget drops the least upvoted text
+        data = data.sort_values('comment_score', ascending=False)
+    else:
+        data = data.nlargest(100, 'comment_score')
+    comments = data["comment_body"].dropna().astype(str)
+    stage_times["load_data"] = time.perf_counter() - start
 
-    if not comments:
+    if comments.empty:
         return "⚠️ No valid text available for summarization."
 
-    cleaned_comments = [clean_text(comment) for comment in comments if len(comment) > 20]
-    clustered_comments = cluster_comments(cleaned_comments, num_clusters)
+    stage = time.perf_counter()
+    comments = comments[comments.str.len() > 20]
+    raw_comments = comments.tolist()
+    cleaned_comments = text_normalize.cleaned_column("comments", "comment_body").loc[comments.index].tolist()
+    stage_times["clean"] = time.perf_counter() - stage
 
-    summarizer = pipeline("summarization", model=SUMMARIZER_MODEL, device=-1)
+    stage = time.perf_counter()
+    clustered_comments = cluster_comments(cleaned_comments, num_clusters, cluster_backend, raw_comments)
+    stage_times["cluster"] = time.perf_counter() - stage
 
-    summarized_chunks = []
-    for cluster in clustered_comments:
-        if not cluster:
-            continue
-        text_to_summarize = " ".join(cluster)[:max_input_length]
-        summary = summarizer(text_to_summarize, max_length=max_summary_length, min_length=min_summary_length, do_sample=False)[0]["summary_text"]
-        summarized_chunks.append(summary)
+    stage = time.perf_counter()
+    summarizer = load_summarizer()
+    stage_times["load_model"] = time.perf_counter() - stage
+
+    stage = time.perf_counter()
+    if mode == "hierarchical":
+        summarized_chunks = hierarchical_summarize(clustered_comments, summarizer, max_input_length, max_summary_length,
+                                                   min_summary_length, max_generate_calls, progress)
+    else:
+        texts = [" ".join(cluster) for cluster in clustered_comments if cluster]
+        summarized_chunks = summarizer.summarize(texts, max_input_length, max_summary_length, min_summary_length, progress)
+    stage_times["summarize"] = time.perf_counter() - stage
 
     summarized_text = " ".join(summarized_chunks)
 
-    with open(SUMMARY_FILE, "w", encoding="utf-8") as file:
-        file.write(summarized_text.strip())
+    storage.write_text(SUMMARY_FILE, summarized_text.strip())
+    storage.write_json(SUMMARY_META_FILE, {"dataset_version": dataset_version})
 
+    stage_times["total"] = time.perf_counter() - start
+    logger.info("Summarization timings: %s", ", ".join(f"{name}={seconds:.2f}s" for name, seconds in stage_times.items()))
     return summarized_text.strip()
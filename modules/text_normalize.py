@@ -0,0 +1,94 @@
+import os
+import re
+import json
+import threading
+import pandas as pd
+from modules import data_access
+
+URL_PATTERN = re.compile(r"http\S+")
+# Digits and punctuation are both single-character removals, so one pass handles either
+DIGIT_OR_PUNCT_PATTERN = re.compile(r"\d|[^\w\s]")
+PUNCT_PATTERN = re.compile(r"[^\w\s]")
+
+# Cleaned columns are also kept on disk so other processes (the batch pipeline, the app) share them
+CLEANED_DIR = "data/cleaned"
+
+_cache = {}
+_lock = threading.Lock()
+
+def clean_for_summary(text):
+    """Drop URLs, digits and punctuation, then strip surrounding whitespace."""
+    text = URL_PATTERN.sub("", text)
+    return DIGIT_OR_PUNCT_PATTERN.sub("", text).strip()
+
+def clean_for_wordcloud(text):
+    """Drop URLs and punctuation and lowercase."""
+    text = URL_PATTERN.sub("", text)
+    return PUNCT_PATTERN.sub("", text).lower()
+
+def _summary_series(series):
+    return series.str.replace(URL_PATTERN, "", regex=True).str.replace(DIGIT_OR_PUNCT_PATTERN, "", regex=True).str.strip()
+
+def _wordcloud_series(series):
+    return series.str.replace(URL_PATTERN, "", regex=True).str.replace(PUNCT_PATTERN, "", regex=True).str.lower()
+
+CLEANERS = {"summary": _summary_series, "wordcloud": _wordcloud_series}
+
+def clean_series(series, kind="summary"):
+    """Vectorised `clean_for_<kind>` over a Series of strings; missing values stay missing."""
+    return CLEANERS[kind](series)
+
+def clean_texts(texts, kind="summary"):
+    return clean_series(pd.Series(list(texts), dtype=object), kind).tolist()
+
+def cleaned_path(name, column, kind):
+    return os.path.join(CLEANED_DIR, f"{name}-{column}-{kind}.parquet")
+
+def _read_cleaned(path, version):
+    meta_path = path + ".json"
+    if not os.path.exists(path) or not os.path.exists(meta_path):
+        return None
+    with open(meta_path, "r", encoding="utf-8") as file:
+        if json.load(file).get("version") != version:
+            return None
+    return pd.read_parquet(path)["cleaned"]
+
+def _write_cleaned(path, version, cleaned):
+    os.makedirs(CLEANED_DIR, exist_ok=True)
+    cleaned.to_frame("cleaned").to_parquet(path + ".tmp")
+    os.replace(path + ".tmp", path)
+    with open(path + ".json", "w", encoding="utf-8") as file:
+        json.dump({"version": version}, file)
+
+def cleaned_column(name, column, kind="summary"):
+    """`column` of dataset `name` after cleaning, computed once per dataset version.
+
+    Results are cached in memory and under CLEANED_DIR, keyed by the dataset version.
+    The result shares the index of `data_access.load_dataset(name)`, so it can be
+    aligned with any projection of the same dataset version. Returns None when the
+    dataset does not exist.
+    """
+    version = data_access.dataset_version(name)
+    if version is None:
+        return None
+
+    key = (name, version, column, kind)
+    with _lock:
+        cleaned = _cache.get(key)
+    if cleaned is not None:
+        return cleaned.copy(deep=False)
+
+    path = cleaned_path(name, column, kind)
+    cleaned = _read_cleaned(path, version)
+    if cleaned is None:
+        df = data_access.load_dataset(name, [column])
+        if df is None:
+            return None
+        cleaned = clean_series(df[column].where(df[column].isna(), df[column].astype(str)), kind)
+        _write_cleaned(path, version, cleaned)
+
+    with _lock:
+        for stale in [k for k in _cache if k[0] == name and k[1] != version]:
+            del _cache[stale]
+        _cache[key] = cleaned
+    return cleaned.copy(deep=False)
@@ -5,28 +5,19 @@ import seaborn as sns
 import matplotlib.pyplot as plt
 import streamlit as st
 from wordcloud import WordCloud
-import re
-import os
+from modules import storage, data_access, word_frequencies
 
 # --- FILE PATHS ---
-SENTIMENT_FILE = "data/reddit_sentiment_analysis.csv"
-REDDIT_DATA_FILE = "data/reddit_data.csv"
-
-@st.cache_data
-def clear_visualization_cache():
-    """Clears cached visualization data to avoid displaying outdated results."""
-    st.cache_data.clear()
+SENTIMENT_FILE = data_access.SENTIMENT_FILE
 
 def plot_sentiment_distribution():
     """Plots the distribution of sentiments in the data with percentages."""
     try:
-        if not os.path.exists(SENTIMENT_FILE):
+        sentiment_df = data_access.load_dataset("sentiment")
+        if sentiment_df is None:
             st.warning("⚠️ Sentiment analysis file not found. Please run sentiment analysis first.")
             return
 
-        clear_visualization_cache()
-        sentiment_df = pd.read_csv(SENTIMENT_FILE)
-
         if 'sentiment' not in sentiment_df.columns:
             raise ValueError("The sentiment file must have a 'sentiment' column.")
 
@@ -49,46 +40,47 @@ def plot_sentiment_distribution():
     except Exception as e:
         st.error(f"❌ Error plotting sentiment distribution: {str(e)}")
 
+@st.cache_data(max_entries=16)
+def _render_word_cloud(sentiment_version, selected_sentiment):
+    """Word cloud image for one sentiment filter; cached per sentiment-file version."""
+    frequencies = word_frequencies.frequencies(word_frequencies.load_word_frequencies(), selected_sentiment)
+    if not frequencies:
+        return None
+
+    wordcloud = WordCloud(
+        background_color="white",
+        width=800,
+        height=400,
+        colormap="viridis",
+        collocations=False
+    ).generate_from_frequencies(frequencies)
+    return wordcloud.to_array()
+
 def generate_word_cloud(selected_sentiment=None):
     """Generates a word cloud from Reddit comments."""
     try:
-        if not os.path.exists(SENTIMENT_FILE):
+        sentiment_df = data_access.load_dataset("sentiment", ["sentiment"])
+        if sentiment_df is None:
             st.warning("⚠️ Sentiment analysis file not found. Please run sentiment analysis first.")
             return
 
-        clear_visualization_cache()
-        sentiment_df = pd.read_csv(SENTIMENT_FILE)
-
-        if 'comment_body' not in sentiment_df.columns or 'sentiment' not in sentiment_df.columns:
-            raise ValueError("The sentiment file must have 'comment_body' and 'sentiment' columns.")
-
-        if selected_sentiment and selected_sentiment != "ALL":
-            sentiment_df = sentiment_df[sentiment_df['sentiment'] == selected_sentiment]
-            if sentiment_df.empty:
-                raise ValueError(f"No comments found for sentiment '{selected_sentiment}'.")
-
-        all_comments = " ".join(sentiment_df['comment_body'].dropna())
-
-        def clean_text(text):
-            text = re.sub(r"http\S+", "", text)
-            text = re.sub(r"[^\w\s]", "", text)
-            return text.lower()
-
-        cleaned_comments = clean_text(all_comments)
-
-        if not cleaned_comments.strip():
+        if selected_sentiment and selected_sentiment != "ALL" and not (sentiment_df['sentiment'] == selected_sentiment).any():
+            raise ValueError(f"No comments found for sentiment '{selected_sentiment}'.")
+
+        version = data_access.dataset_version("sentiment")
+        # Counts are kept up to date when sentiment results are written; this only catches up older files
+        if word_frequencies.counted_version() != version:
+            word_frequencies.update_word_frequencies(
+                data_access.load_dataset("sentiment", ["comment_id", "comment_body", "sentiment"]),
+                data_access.sentiment_meta().get("model", ""),
+                version,
+            )
+        image = _render_word_cloud(version, selected_sentiment)
+        if image is None:
             raise ValueError("No valid text available for word cloud.")
 
-        wordcloud = WordCloud(
-            background_color="white",
-            width=800,
-            height=400,
-            colormap="viridis",
-            collocations=False
-        ).generate(cleaned_comments)
-
         plt.figure(figsize=(12, 6))
-        plt.imshow(wordcloud, interpolation="bilinear")
+        plt.imshow(image, interpolation="bilinear")
         plt.axis("off")
         plt.title(f"Word Cloud for Sentiment: {selected_sentiment}" if selected_sentiment else "Word Cloud of Reddit Comments", fontsize=16)
         st.pyplot(plt)
@@ -99,17 +91,16 @@ def generate_word_cloud(selected_sentiment=None):
 def plot_engagement_metrics():
     """Plot engagement metrics: Top 10 subreddits by post count."""
     try:
-        if not os.path.exists(REDDIT_DATA_FILE):
+        if not storage.dataset_exists():
             st.warning("⚠️ Reddit data file not found. Please fetch new data first.")
             return
 
-        clear_visualization_cache()
-        df = pd.read_csv(REDDIT_DATA_FILE)
+        df = data_access.load_dataset("joined", ['subreddit'])
 
-        if 'subreddit' not in df.columns:
-            raise ValueError("The Reddit data file must have a 'subreddit' column.")
-
-        top_subreddits = df['subreddit'].value_counts().head(10)
+        # subreddit is categorical; drop categories with no rows so they don't get plotted
+        top_subreddits = df['subreddit'].value_counts()
+        top_subreddits = top_subreddits[top_subreddits > 0].head(10)
+        top_subreddits.index = top_subreddits.index.astype(str)
 
         plt.figure(figsize=(10, 6))
         ax = sns.barplot(y=top_subreddits.index, x=top_subreddits.values, palette="viridis")
@@ -128,17 +119,14 @@ def plot_engagement_metrics():
 def plot_hourly_post_activity():
     """Plot the distribution of Reddit posts by hour."""
     try:
-        if not os.path.exists(REDDIT_DATA_FILE):
+        if not storage.dataset_exists():
             st.warning("⚠️ Reddit data file not found. Please fetch new data first.")
             return
 
-        clear_visualization_cache()
-        df = pd.read_csv(REDDIT_DATA_FILE)
-
-        if 'post_created_utc' not in df.columns:
-            raise ValueError("The Reddit data file must have a 'post_created_utc' column.")
+        df = data_access.load_dataset("joined", ['post_created_utc'])
 
-        df['hour'] = pd.to_datetime(df['post_created_utc'], errors='coerce').dt.hour
+        # Cached frames are shared between pages; assign() works on a copy
+        df = df.assign(hour=pd.to_datetime(df['post_created_utc'], errors='coerce').dt.hour)
 
         plt.figure(figsize=(10, 6))
         sns.countplot(data=df, x="hour", palette="husl")
@@ -151,18 +139,16 @@ def plot_hourly_post_activity():
 def plot_sentiment_trend():
     """Plot sentiment trend over time."""
     try:
-        if not os.path.exists(SENTIMENT_FILE):
+        sentiment_df = data_access.load_dataset("sentiment")
+        if sentiment_df is None:
             st.warning("⚠️ Sentiment analysis file not found. Please run sentiment analysis first.")
             return
 
-        clear_visualization_cache()
-        sentiment_df = pd.read_csv(SENTIMENT_FILE)
-
         if 'post_created_utc' not in sentiment_df.columns or 'sentiment' not in sentiment_df.columns:
             raise ValueError("The sentiment file must have 'post_created_utc' and 'sentiment' columns.")
 
-        sentiment_df['post_created_utc'] = pd.to_datetime(sentiment_df['post_created_utc'], errors='coerce')
-        sentiment_df['date'] = sentiment_df['post_created_utc'].dt.date
+        sentiment_df = sentiment_df.assign(post_created_utc=pd.to_datetime(sentiment_df['post_created_utc'], errors='coerce'))
+        sentiment_df = sentiment_df.assign(date=sentiment_df['post_created_utc'].dt.date)
         sentiment_trend = sentiment_df.groupby(['date', 'sentiment']).size().unstack(fill_value=0)
 
         plt.figure(figsize=(12, 6))
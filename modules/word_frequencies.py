@@ -0,0 +1,132 @@
+import os
+import re
+import json
+import threading
+from collections import Counter, defaultdict
+import pandas as pd
+from wordcloud import STOPWORDS
+from modules import text_normalize
+from modules.sentiment_cache import text_hash
+
+WORD_FREQUENCIES_FILE = "data/word_frequencies.parquet"
+COUNTED_COMMENTS_FILE = "data/word_frequencies_comments.parquet"
+# Version of the sentiment file the counts were last brought up to date with
+WORD_FREQUENCIES_META_FILE = "data/word_frequencies.json"
+ALL_LABELS = "ALL"
+TABLE_COLUMNS = ["sentiment", "word", "count"]
+# One row per comment and word; a comment without countable words keeps one row with word ""
+COUNTED_COLUMNS = ["comment_id", "text_hash", "sentiment", "word", "count"]
+
+# Same tokenisation as WordCloud.process_text with its default settings
+WORD_PATTERN = re.compile(r"\w[\w']*")
+STOPWORDS_LOWER = frozenset(word.lower() for word in STOPWORDS)
+
+_lock = threading.Lock()
+
+def _words(cleaned_text):
+    for word in WORD_PATTERN.findall(cleaned_text):
+        if word.lower().endswith("'s"):
+            word = word[:-2]
+        if not word.isdigit() and word.lower() not in STOPWORDS_LOWER:
+            yield word
+
+def count_words(texts):
+    """Raw token counts for `texts` after word-cloud cleaning, stopwords and digits removed."""
+    counts = Counter()
+    for text in text_normalize.clean_texts(texts, "wordcloud"):
+        counts.update(_words(text))
+    return counts
+
+def normalize_plurals(counts):
+    """Fold "xs" into "x" and merge case variants, as WordCloud does before drawing."""
+    by_lower = defaultdict(Counter)
+    for word, count in counts.items():
+        by_lower[word.lower()][word] += count
+
+    for key in list(by_lower):
+        if key.endswith("s") and not key.endswith("ss") and key[:-1] in by_lower:
+            singular = by_lower[key[:-1]]
+            for word, count in by_lower.pop(key).items():
+                singular[word[:-1]] += count
+
+    return {cases.most_common(1)[0][0]: sum(cases.values()) for cases in by_lower.values()}
+
+def _load():
+    if not os.path.exists(WORD_FREQUENCIES_FILE) or not os.path.exists(COUNTED_COMMENTS_FILE):
+        return pd.DataFrame(columns=TABLE_COLUMNS), pd.DataFrame(columns=COUNTED_COLUMNS)
+    counted = pd.read_parquet(COUNTED_COMMENTS_FILE)
+    if list(counted.columns) != COUNTED_COLUMNS:
+        # Written before per-comment counts were kept; everything is counted again
+        counted = pd.DataFrame(columns=COUNTED_COLUMNS)
+    return pd.read_parquet(WORD_FREQUENCIES_FILE), counted
+
+def _save(table, counted):
+    os.makedirs(os.path.dirname(WORD_FREQUENCIES_FILE) or ".", exist_ok=True)
+    for frame, path in ((table, WORD_FREQUENCIES_FILE), (counted, COUNTED_COMMENTS_FILE)):
+        frame.to_parquet(path + ".tmp", index=False)
+        os.replace(path + ".tmp", path)
+
+def _save_version(version):
+    os.makedirs(os.path.dirname(WORD_FREQUENCIES_META_FILE) or ".", exist_ok=True)
+    with open(WORD_FREQUENCIES_META_FILE + ".tmp", "w", encoding="utf-8") as file:
+        json.dump({"version": version}, file)
+    os.replace(WORD_FREQUENCIES_META_FILE + ".tmp", WORD_FREQUENCIES_META_FILE)
+
+def counted_version():
+    """The sentiment-file version passed to the last `update_word_frequencies`, or None."""
+    if not os.path.exists(WORD_FREQUENCIES_META_FILE):
+        return None
+    with open(WORD_FREQUENCIES_META_FILE, "r", encoding="utf-8") as file:
+        return json.load(file).get("version")
+
+def load_word_frequencies():
+    return _load()[0]
+
+def update_word_frequencies(df, namespace, version=None):
+    """Bring the per-sentiment word counts in line with `df` and return them.
+
+    `df` is the sentiment dataset (comment_id, comment_body, sentiment); `namespace`
+    is hashed with each comment, as for the sentiment results. Counts are kept per
+    comment, so only comments not counted before are tokenised: an overlapping
+    refresh drops the counts of comments that left the dataset and adds the new
+    ones. An edited comment or a model change gives a new hash and is counted again.
+    `version` is recorded for `counted_version`.
+    """
+    keys = pd.DataFrame({
+        "comment_id": df["comment_id"].astype(str).to_numpy(),
+        "text_hash": [text_hash(text, namespace) for text in df["comment_body"].astype(str)],
+    })
+
+    with _lock:
+        table, counted = _load()
+        current = pd.MultiIndex.from_frame(keys)
+        counted_keys = pd.MultiIndex.from_frame(counted[["comment_id", "text_hash"]].astype(str))
+        kept = counted[counted_keys.isin(current)]
+        new = ~current.isin(counted_keys)
+        if not new.any() and len(kept) == len(counted):
+            _save_version(version)
+            return table
+
+        rows = []
+        new_df = df[new]
+        cleaned = text_normalize.clean_texts(new_df["comment_body"].fillna("").astype(str), "wordcloud")
+        for comment_id, hashed, label, text in zip(keys["comment_id"][new], keys["text_hash"][new], new_df["sentiment"], cleaned):
+            counts = Counter(_words(text))
+            rows.extend((comment_id, hashed, label, word, count) for word, count in counts.items())
+            if not counts:
+                rows.append((comment_id, hashed, label, "", 0))
+
+        counted = pd.concat([kept, pd.DataFrame(rows, columns=COUNTED_COLUMNS)], ignore_index=True)
+        counted = counted.drop_duplicates(["comment_id", "text_hash", "word"])
+        table = (counted[counted["count"] > 0]
+                 .groupby(["sentiment", "word"], as_index=False, observed=True)["count"].sum()[TABLE_COLUMNS])
+        _save(table, counted)
+        _save_version(version)
+        return table
+
+def frequencies(table, sentiment=None):
+    """Word -> frequency for one sentiment label (or every label), ready for `generate_from_frequencies`."""
+    if sentiment and sentiment != ALL_LABELS:
+        table = table[table["sentiment"] == sentiment]
+    counts = table.groupby("word")["count"].sum()
+    return normalize_plurals(dict(zip(counts.index, counts.to_numpy().tolist())))
@@ -0,0 +1,48 @@
+import json
+import time
+import argparse
+import torch
+from modules import optimized_models, qa_bot, sentiment_analysis
+from transformers import AutoTokenizer, AutoModel, AutoModelForQuestionAnswering, AutoModelForSequenceClassification
+
+MODELS = {
+    "embedding": (qa_bot.BERT_MODEL_PATH, AutoModel),
+    "qa": (qa_bot.QA_MODEL_PATH, AutoModelForQuestionAnswering),
+    "sentiment": (sentiment_analysis.SENTIMENT_MODEL, AutoModelForSequenceClassification),
+}
+
+def _seconds_per_call(model, inputs, repeats=5):
+    with torch.no_grad():
+        model(**inputs)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            model(**inputs)
+    return (time.perf_counter() - start) / repeats
+
+def build_and_check(mode, kinds=MODELS):
+    """Build the `mode` copy of each model (exporting ONNX graphs once) and compare it with fp32 on the fixed sample."""
+    report = {}
+    for kind in kinds:
+        model_path, model_class = MODELS[kind]
+        tokenizer = AutoTokenizer.from_pretrained(model_path)
+        reference = model_class.from_pretrained(model_path).eval()
+        # optimize() may convert in place, so it gets its own copy of the weights
+        optimized = optimized_models.optimize(model_class.from_pretrained(model_path).eval(), tokenizer, model_path, kind, mode)
+
+        encoded = optimized_models.sample_inputs(tokenizer, kind)
+        inputs = {name: encoded[name] for name in tokenizer.model_input_names if name in encoded}
+        fp32_seconds = _seconds_per_call(reference, inputs)
+        optimized_seconds = _seconds_per_call(optimized, inputs)
+        report[kind] = {
+            "cache_dir": optimized_models.optimized_dir(model_path, mode) if mode == "onnx" else None,
+            "speedup": fp32_seconds / optimized_seconds if optimized_seconds > 0 else None,
+            **optimized_models.accuracy_check(reference, optimized, tokenizer, kind),
+        }
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build int8 / ONNX copies of the local models and check them against fp32.")
+    parser.add_argument("--mode", choices=["int8", "onnx"], default="int8")
+    parser.add_argument("--models", default=",".join(MODELS), help="Comma-separated subset of: " + ", ".join(MODELS))
+    args = parser.parse_args()
+    print(json.dumps(build_and_check(args.mode, [kind for kind in args.models.split(",") if kind]), indent=2))
@@ -0,0 +1,65 @@
+import sys
+import json
+import logging
+import argparse
+
+from modules import pipeline, sharded_inference, model_registry
+
+def parse_args(argv=None):
+    stage_names = [stage.name for stage in pipeline.STAGES]
+    parser = argparse.ArgumentParser(description="Run the Reddit analysis pipeline without the Streamlit app.")
+    parser.add_argument("--keyword", help="Fetch new Reddit data for this keyword first; omit to reuse the stored data.")
+    parser.add_argument("--post-limit", type=int, default=pipeline.DEFAULT_CONFIG["post_limit"])
+    parser.add_argument("--max-comments", type=int, default=pipeline.DEFAULT_CONFIG["max_comments"])
+    parser.add_argument("--max-runtime", type=int, default=pipeline.DEFAULT_CONFIG["max_runtime"])
+    parser.add_argument("--summary-mode", choices=["truncate", "hierarchical"], default=pipeline.DEFAULT_CONFIG["summary_mode"])
+    parser.add_argument("--num-clusters", default=pipeline.DEFAULT_CONFIG["num_clusters"],
+                        type=lambda value: value if value == "auto" else int(value))
+    parser.add_argument("--cluster-backend", choices=["tfidf", "embedding"], default=pipeline.DEFAULT_CONFIG["cluster_backend"])
+    parser.add_argument("--max-input-length", type=int, default=pipeline.DEFAULT_CONFIG["max_input_length"],
+                        help="Summarizer input limit in tokens.")
+    parser.add_argument("--max-summary-length", type=int, default=pipeline.DEFAULT_CONFIG["max_summary_length"])
+    parser.add_argument("--min-summary-length", type=int, default=pipeline.DEFAULT_CONFIG["min_summary_length"])
+    parser.add_argument("--max-generate-calls", type=int, default=pipeline.DEFAULT_CONFIG["max_generate_calls"])
+    parser.add_argument("--stages", default=",".join(stage_names),
+                        help=f"Comma-separated stages to run (default: all of {', '.join(stage_names)}).")
+    parser.add_argument("--force", default="", help="Comma-separated stages to rerun even if their inputs are unchanged, or 'all'.")
+    parser.add_argument("--workers", type=int, default=pipeline.PIPELINE_WORKERS, help="Stages run concurrently.")
+    parser.add_argument("--inference-workers", type=int, default=sharded_inference.INFERENCE_WORKERS,
+                        help="Worker processes for large sentiment and embedding jobs.")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    args = parse_args(argv)
+    stages = [name for name in args.stages.split(",") if name]
+    force = stages if args.force == "all" else [name for name in args.force.split(",") if name]
+    unknown = sorted(set(stages + force) - {stage.name for stage in pipeline.STAGES})
+    if unknown:
+        print(f"Unknown stage(s): {', '.join(unknown)}", file=sys.stderr)
+        return 2
+    config = {
+        "keyword": args.keyword,
+        "post_limit": args.post_limit,
+        "max_comments": args.max_comments,
+        "max_runtime": args.max_runtime,
+        "summary_mode": args.summary_mode,
+        "num_clusters": args.num_clusters,
+        "cluster_backend": args.cluster_backend,
+        "max_input_length": args.max_input_length,
+        "max_summary_length": args.max_summary_length,
+        "min_summary_length": args.min_summary_length,
+        "max_generate_calls": args.max_generate_calls,
+    }
+
+    sharded_inference.INFERENCE_WORKERS = args.inference_workers
+    model_registry.warm_up(background=True)
+    try:
+        report = pipeline.run_pipeline(config, stages=stages, force=force, max_workers=args.workers)
+    finally:
+        sharded_inference.shutdown()
+    print(json.dumps({"stages": report, "model_load_seconds": model_registry.load_times()}, indent=2, default=str))
+    return 1 if any(result["status"] in ("failed", "blocked") for result in report.values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
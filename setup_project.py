@@ -1,12 +1,30 @@
-from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+import os
 
-model_name = "sshleifer/distilbart-cnn-12-6"
-model_path = "./models/summarizer_model"
+# The one script that downloads from the Hub; model_registry defaults to offline
+os.environ["HF_HUB_OFFLINE"] = "0"
+os.environ["TRANSFORMERS_OFFLINE"] = "0"
 
-# Download and save model and tokenizer locally
-model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model.save_pretrained(model_path)
-tokenizer.save_pretrained(model_path)
+from transformers import AutoModelForQuestionAnswering, AutoModelForSeq2SeqLM, AutoModelForSequenceClassification, AutoTokenizer
+from modules import model_registry
 
-print(f"Model saved at {model_path}")
+# Hub checkpoints exported into models/, keyed by their LOCAL_MODELS name. The sentiment and
+# Q/A pages refuse to load until this has been run once with Hub access.
+EXPORTS = {
+    "summarizer": (AutoModelForSeq2SeqLM, "sshleifer/distilbart-cnn-12-6"),
+    # Must be the fine-tuned classifier: a bare DistilBertModel has no classification head
+    "sentiment": (AutoModelForSequenceClassification, "distilbert-base-uncased-finetuned-sst-2-english"),
+    # Likewise needs the span-prediction head (qa_outputs), not the bare encoder
+    "qa": (AutoModelForQuestionAnswering, "distilbert-base-uncased-distilled-squad"),
+}
+
+# Download and save each model and tokenizer locally
+for name, (model_class, model_name) in EXPORTS.items():
+    model_path = model_registry.model_path(name)
+    model = model_class.from_pretrained(model_name)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model.save_pretrained(model_path)
+    tokenizer.save_pretrained(model_path)
+    print(f"Model saved at {model_path}")
+
+# Record checksums so the app can verify the copies before loading them offline
+model_registry.write_checksums(list(EXPORTS))
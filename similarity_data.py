@@ -1,16 +1,20 @@
 import pandas as pd
 import random
+from modules import storage
 
 def create_similarity_dataset(input_file, output_file, max_samples=5000):
     """
     Create a dataset of comment pairs with similarity labels.
-    :param input_file: Path to reddit_data.csv file.
+    :param input_file: Path to a reddit_data.csv export, or None to read the columnar store.
     :param output_file: Path to save similarity_dataset.csv file.
     :param max_samples: Maximum number of pairs to generate.
     """
     try:
-        # Load Reddit data
-        df = pd.read_csv(input_file)
+        # Load Reddit data (from the columnar store unless a CSV export is given)
+        if input_file is None:
+            df = storage.read_joined(['comment_body', 'subreddit'])
+        else:
+            df = pd.read_csv(input_file)
 
         # Ensure required columns exist
         if 'comment_body' not in df.columns or 'subreddit' not in df.columns:
@@ -47,6 +51,6 @@ def create_similarity_dataset(input_file, output_file, max_samples=5000):
         print(f"Error creating similarity dataset: {e}")
 
 # Generate similarity dataset
-input_file = "data/reddit_data.csv"
+input_file = None
 output_file = "data/similarity_dataset.csv"
 create_similarity_dataset(input_file, output_file)
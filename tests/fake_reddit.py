@@ -0,0 +1,123 @@
+import re
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+COMMENTS_PATH = re.compile(r"^/comments/(\w+)/?$")
+
+def _submission(post_id):
+    return {
+        "id": post_id,
+        "name": f"t3_{post_id}",
+        "title": f"Post {post_id}",
+        "selftext": f"Body of {post_id}",
+        "author": "poster",
+        "score": 10,
+        "url": f"https://www.reddit.com/r/fake/comments/{post_id}/",
+        "permalink": f"/r/fake/comments/{post_id}/",
+        "created_utc": 1700000000.0,
+        "subreddit": "fake",
+        "num_comments": 3,
+    }
+
+def _comment(post_id, number):
+    return {
+        "id": f"{post_id}c{number}",
+        "name": f"t1_{post_id}c{number}",
+        "body": f"Comment {number} on {post_id}",
+        "author": f"user{number}",
+        "score": number,
+        "parent_id": f"t3_{post_id}",
+        "link_id": f"t3_{post_id}",
+        "subreddit": "fake",
+        "replies": "",
+    }
+
+def _listing(kind, children):
+    return {"kind": "Listing", "data": {"after": None, "before": None, "dist": len(children),
+                                        "children": [{"kind": kind, "data": child} for child in children]}}
+
+class FakeReddit(ThreadingHTTPServer):
+    """Just enough of reddit.com for PRAW: an access token, r/all search and comment trees.
+
+    Every request is recorded in `requests`; comment-tree responses are delayed by
+    `comment_delay` seconds and `max_concurrent` records how many overlapped.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, num_posts=10, comments_per_post=3, comment_delay=0.05):
+        super().__init__(("127.0.0.1", 0), FakeRedditHandler)
+        self.post_ids = [f"p{i}" for i in range(num_posts)]
+        self.comments_per_post = comments_per_post
+        self.comment_delay = comment_delay
+        self.requests = []
+        self.in_flight = 0
+        self.max_concurrent = 0
+        self.lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name="fake-reddit", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+class FakeRedditHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        self.server.requests.append(("POST", self.path))
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if urlparse(self.path).path.rstrip("/") == "/api/v1/access_token":
+            self._send({"access_token": "fake-token", "token_type": "bearer", "expires_in": 3600, "scope": "*"})
+        else:
+            self.send_error(404)
+
+    def do_GET(self):
+        self.server.requests.append(("GET", self.path))
+        url = urlparse(self.path)
+        if url.path.rstrip("/") == "/r/all/search":
+            limit = int(parse_qs(url.query).get("limit", ["100"])[0])
+            self._send(_listing("t3", [_submission(post_id) for post_id in self.server.post_ids[:limit]]))
+            return
+
+        match = COMMENTS_PATH.match(url.path)
+        if match is None:
+            self.send_error(404)
+            return
+        post_id = match.group(1)
+        server = self.server
+        with server.lock:
+            server.in_flight += 1
+            server.max_concurrent = max(server.max_concurrent, server.in_flight)
+        try:
+            time.sleep(server.comment_delay)
+            comments = [_comment(post_id, number) for number in range(server.comments_per_post)]
+            self._send([_listing("t3", [_submission(post_id)]), _listing("t1", comments)])
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+if __name__ == "__main__":
+    server = FakeReddit(num_posts=100)
+    print(f"Fake Reddit on {server.url}; set REDDIT_URL and REDDIT_OAUTH_URL to it")
+    server.serve_forever()
@@ -0,0 +1,31 @@
+import random
+from modules.aspect_index import PhraseIndex
+
+# No word is a substring of another, so a substring match is always a whole-word match
+VOCAB = ["battery", "camera", "screen", "price", "support", "update", "phone", "great", "terrible", "life", "sound"]
+SEPARATORS = [" ", " ", ", ", ". ", "! ", " - "]
+
+def _comments(rng, count):
+    comments = []
+    for _ in range(count):
+        words = [rng.choice(VOCAB) for _ in range(rng.randint(0, 12))]
+        words = [word.upper() if rng.random() < 0.1 else word.capitalize() if rng.random() < 0.2 else word for word in words]
+        comments.append("".join(word + rng.choice(SEPARATORS) for word in words).strip())
+    return comments
+
+def test_lookup_matches_substring_filter_for_whole_words():
+    rng = random.Random(0)
+    comments = _comments(rng, 500)
+    index = PhraseIndex(comments)
+    phrases = VOCAB + [f"{a} {b}" for a in VOCAB[:4] for b in VOCAB[:4]] + ["battery life is", "missing"]
+    for phrase in phrases:
+        assert index.lookup(phrase) == [c for c in comments if phrase in c.lower()], phrase
+
+def test_partial_words_do_not_match():
+    index = PhraseIndex(["Batteryless design", "the battery is fine", "rebattery", "battery-powered"])
+    assert index.lookup("battery") == ["the battery is fine", "battery-powered"]
+
+def test_empty_index():
+    index = PhraseIndex([])
+    assert len(index) == 0
+    assert index.lookup("battery") == []
@@ -0,0 +1,27 @@
+import random
+from modules.batching import token_budget_batches
+
+def _check(lengths, max_tokens, max_batch_size):
+    batches = token_budget_batches(lengths, max_tokens, max_batch_size)
+    covered = sorted(i for batch in batches for i in batch)
+    assert covered == list(range(len(lengths)))
+    for batch in batches:
+        assert len(batch) <= max_batch_size
+        # A single over-long item still gets a batch of its own
+        if len(batch) > 1:
+            assert len(batch) * max(max(lengths[i], 1) for i in batch) <= max_tokens
+
+def test_every_index_once_within_budget():
+    rng = random.Random(0)
+    for _ in range(200):
+        lengths = [rng.randint(0, 600) for _ in range(rng.randint(0, 300))]
+        _check(lengths, rng.choice([128, 512, 8192]), rng.choice([1, 8, 256]))
+
+def test_long_items_and_empty_input():
+    assert token_budget_batches([]) == []
+    _check([10_000, 5, 5, 10_000], 512, 256)
+
+def test_batches_are_length_sorted():
+    lengths = [3, 50, 7, 50, 1]
+    order = [i for batch in token_budget_batches(lengths, 100, 2) for i in batch]
+    assert [lengths[i] for i in order] == sorted(lengths, reverse=True)
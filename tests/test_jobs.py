@@ -0,0 +1,27 @@
+import threading
+from modules.jobs import JobManager
+
+def _wait(job):
+    job.future.result(timeout=5)
+
+def test_same_key_reuses_in_flight_job():
+    manager = JobManager(max_workers=1)
+    release = threading.Event()
+    first = manager.submit("work", lambda job: release.wait(5), key=("work", 1))
+    assert manager.submit("work", lambda job: None, key=("work", 1)) is first
+    assert manager.submit("work", lambda job: None, key=("work", 2)) is not first
+    release.set()
+    _wait(first)
+
+def test_finished_jobs_are_pruned_past_the_bound():
+    manager = JobManager(max_workers=1, max_finished=3)
+    other = manager.submit("other", lambda job: "kept")
+    _wait(other)
+    for i in range(10):
+        _wait(manager.submit("work", lambda job, i=i: i, key=i))
+
+    remaining = manager.jobs()
+    # Three finished "work" jobs within the bound, the newest "work" job, and the newest "other" job
+    assert len(remaining) == 5
+    assert manager.latest("other").result == "kept"
+    assert manager.latest("work").result == 9
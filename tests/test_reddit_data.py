@@ -0,0 +1,93 @@
+import time
+import pytest
+
+pytest.importorskip("praw")
+pytest.importorskip("pandas")
+
+from modules import reddit_data
+from tests.fake_reddit import FakeReddit
+
+class CountingLimiter(reddit_data.RateLimiter):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.acquired = 0
+
+    def acquire(self, deadline=None):
+        allowed = super().acquire(deadline)
+        self.acquired += allowed
+        return allowed
+
+@pytest.fixture
+def fake_reddit(monkeypatch):
+    server = FakeReddit(num_posts=12, comments_per_post=3).start()
+    monkeypatch.setattr(reddit_data, "REDDIT_ENDPOINTS", {"oauth_url": server.url, "reddit_url": server.url})
+    yield server
+    server.stop()
+
+def test_posts_fetched_concurrently_in_search_order(fake_reddit):
+    posts = list(reddit_data.iter_reddit_posts("anything", post_limit=12, max_comments=2, max_workers=4,
+                                               limiter=reddit_data.RateLimiter(rate=1000)))
+
+    assert [post["post_id"] for post in posts] == fake_reddit.post_ids
+    assert all(len(post["comments"]) == 2 for post in posts)
+    assert posts[0]["subreddit"] == "fake"
+    assert fake_reddit.max_concurrent > 1
+
+def test_every_request_is_rate_limited(fake_reddit):
+    # A bucket of 5 refilling at 10/s; 12 comment trees + search + tokens must wait for refills
+    limiter = CountingLimiter(rate=5, per=0.5)
+    start = time.monotonic()
+    posts = list(reddit_data.iter_reddit_posts("anything", post_limit=12, max_workers=4, limiter=limiter))
+    elapsed = time.monotonic() - start
+
+    assert len(posts) == 12
+    assert limiter.acquired == len(fake_reddit.requests)
+    assert elapsed >= (len(fake_reddit.requests) - 5) / 10 * 0.9
+
+def test_deadline_stops_fetching(fake_reddit):
+    # One token and a slow refill: the run ends at the deadline instead of waiting for tokens
+    limiter = reddit_data.RateLimiter(rate=1, per=60)
+    start = time.monotonic()
+    posts = list(reddit_data.iter_reddit_posts("anything", post_limit=12, max_runtime=0.5, limiter=limiter))
+
+    assert posts == []
+    assert time.monotonic() - start < 5
+
+def test_return_value_reports_completion(fake_reddit):
+    def drain(posts):
+        while True:
+            try:
+                next(posts)
+            except StopIteration as stop:
+                return stop.value
+
+    assert drain(reddit_data.iter_reddit_posts("anything", post_limit=12, limiter=reddit_data.RateLimiter(rate=1000))) is True
+    assert drain(reddit_data.iter_reddit_posts("anything", post_limit=12, max_runtime=0.5,
+                                               limiter=reddit_data.RateLimiter(rate=1, per=60))) is False
+
+def test_checkpoint_complete_only_when_fetch_finished(fake_reddit, tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    # Checkpoint and store paths are relative to the working directory
+    monkeypatch.chdir(tmp_path)
+
+    reddit_data.fetch_to_store("anything", post_limit=12, max_runtime=0.5,
+                               limiter=reddit_data.RateLimiter(rate=3, per=60))
+    assert reddit_data._load_checkpoint()["complete"] is False
+
+    reddit_data.fetch_to_store("anything", post_limit=12, limiter=reddit_data.RateLimiter(rate=1000))
+    checkpoint = reddit_data._load_checkpoint()
+    assert checkpoint["complete"] is True
+    assert len(checkpoint["post_ids"]) == 12
+
+def test_failed_fetch_never_resumes_onto_previous_keyword(fake_reddit, tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    monkeypatch.chdir(tmp_path)
+    from modules import storage
+
+    reddit_data.fetch_to_store("first", post_limit=12, limiter=reddit_data.RateLimiter(rate=1000))
+    assert storage.store_exists()
+
+    # Only the token request fits: nothing is written for the second keyword
+    reddit_data.fetch_to_store("second", post_limit=12, max_runtime=0.5, limiter=reddit_data.RateLimiter(rate=1, per=60))
+    assert not storage.store_exists()
+    assert reddit_data._load_checkpoint()["post_ids"] == []
@@ -0,0 +1,27 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from benchmarks import corpus
+from modules import retrieval
+
+def _vectors(size=5000, queries=50):
+    vectors = corpus.synthetic_embeddings(size + queries, topics=32, seed=1)
+    return vectors[:size], vectors[size:]
+
+def test_exact_search_finds_itself():
+    embeddings, _ = _vectors(1000, 0)
+    indices, scores = retrieval.ExactRetriever().build(embeddings).search(embeddings[42], 5)
+    assert indices[0] == 42
+    assert list(scores) == sorted(scores, reverse=True)
+
+def test_ivf_recall_against_exact():
+    embeddings, queries = _vectors()
+    report = retrieval.evaluate_retriever(retrieval.IVFRetriever(n_lists=32, n_probe=8).build(embeddings), embeddings, queries, k=10)
+    assert report["queries"] == len(queries)
+    assert report["recall"] >= 0.9
+
+def test_ivf_probing_every_list_is_exact():
+    embeddings, queries = _vectors(2000, 20)
+    report = retrieval.evaluate_retriever(retrieval.IVFRetriever(n_lists=16, n_probe=16).build(embeddings), embeddings, queries, k=10)
+    assert report["recall"] == 1.0
@@ -0,0 +1,46 @@
+import re
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+
+from modules import text_normalize
+
+def old_clean_text(text):
+    # summarizer.clean_text before the shared module
+    text = re.sub(r'http\S+', '', text)
+    text = re.sub(r'\d+', '', text)
+    text = re.sub(r'[^\w\s]', '', text)
+    return text.strip()
+
+EDGE_STRINGS = [
+    "",
+    "   ",
+    "plain text",
+    "See https://example.com/a?b=1 and http://x.y/z!",
+    "httpnot-a-link and http",
+    "Prices: $1,299.99 (was 1500)",
+    "tabs\tand\nnewlines\r\n",
+    "émojis 🎉 and ünïcödé ½ ² ٣",
+    "snake_case_words and __dunder__",
+    "...!!!???",
+    "12345",
+    "mixed123digits456inside",
+    "  leading and trailing punctuation!  ",
+    "C++ & C# vs. Python3.12",
+    "url at end https://t.co/abc",
+    "https://only.a.link",
+]
+
+def test_clean_for_summary_matches_old_clean_text():
+    for text in EDGE_STRINGS:
+        assert text_normalize.clean_for_summary(text) == old_clean_text(text), repr(text)
+
+def test_summary_series_matches_old_clean_text():
+    cleaned = text_normalize.clean_series(pd.Series(EDGE_STRINGS, dtype=object), "summary")
+    assert cleaned.tolist() == [old_clean_text(text) for text in EDGE_STRINGS]
+
+def test_missing_values_stay_missing():
+    cleaned = text_normalize.clean_series(pd.Series(["a1!", None], dtype=object), "summary")
+    assert cleaned.iloc[0] == "a"
+    assert cleaned.isna().iloc[1]